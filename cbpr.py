@@ -1,18 +1,10 @@
+from regions import find_info
 
 class CbprRegions:
-    ' All regions listed on CBPR '
-    all_regions = {}
-
-    def __init__(self):
-        arr = ["United States", "Canada", "Japan", "Republic of Korea",
-                            "Philippines", "Singapore", "Taiwan"]
-        for item in arr:
-            itemu = item.upper()
-            self.all_regions[itemu] = 1
+    ' All regions listed on CBPR, see "areas" of rules.json '
 
     def find(self, regionname: str) -> bool:
-        regionu = regionname.upper()
-        return regionu in self.all_regions # Case in-sensitive
+        return find_info(regionname).cbpr # Case in-sensitive
 
 cbpr_list = CbprRegions()
 
@@ -0,0 +1,331 @@
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+import file_checker
+from file_checker import MerkleHash, MerkleTree, BLAKE_DIGEST_SIZE
+
+# Frame of a chunk: index, length, number of proof steps.
+# Then the siblings of the proof and the bytes of the chunk. The receiver knows
+# on which side each sibling is from the index, see file_checker.proof_shape().
+FRAME = struct.Struct("!IIB")
+PROOF_STEP = struct.Struct(f"!{BLAKE_DIGEST_SIZE}s")
+# Answers of the receiver
+ACK = b"\x01"
+NAK = b"\x00"
+# Concurrent streams of a transfer
+DEFAULT_STREAMS = 4
+# Times a chunk is sent again after the receiver rejected it
+DEFAULT_RETRIES = 3
+# Largest chunk a receiver takes, it holds one chunk per stream in memory
+MAX_CHUNK_SIZE = 64 << 20
+# Largest transfer a receiver takes by default
+MAX_TRANSFER_SIZE = 1 << 40
+
+class TransferReport(NamedTuple):
+    ''' Result of send_file(). failed: indexes of the chunks never accepted '''
+    transfer_id: str
+    chunks: int
+    size: int
+    resent: int
+    failed: list
+    seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return len(self.failed) == 0
+
+    def throughput(self) -> float:
+        ''' Bytes per second '''
+        if self.seconds == 0:
+            return 0.0
+        return self.size / self.seconds
+
+def send_file(filename: str, address: tuple, transfer_id: str, data_hash: str = None,
+              tree: MerkleTree = None, streams: int = DEFAULT_STREAMS,
+              retries: int = DEFAULT_RETRIES) -> TransferReport:
+    ''' Send a file in the chunks of its Merkle tree over streams connections.
+    Each chunk goes with its proof, so the receiver checks it against the root
+    alone. Chunks are sent from the file with socket.sendfile(), zero-copy where
+    the platform has os.sendfile(). data_hash: the dataHash of the OPER credential,
+    the tree is built with its chunk size. '''
+    start = time.perf_counter()
+    if tree is None:
+        chunk_size = file_checker.MERKLE_CHUNK_SIZE
+        if data_hash is not None:
+            chunk_size = MerkleHash.parse(data_hash).chunk_size
+        tree = MerkleTree.from_file(filename, chunk_size, workers=streams)
+    if data_hash is not None and str(tree.data_hash) != data_hash:
+        raise ValueError(f"{filename} does not match the dataHash {data_hash}")
+
+    pending = queue.SimpleQueue()
+    for index in range(len(tree.leaves) if tree.size > 0 else 0):
+        pending.put(index)
+    sender = ChunkSender(filename, address, transfer_id, tree, pending, retries)
+    threads = [threading.Thread(target=sender.run, daemon=True) for _ in range(streams)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if sender.errors and sender.sent == 0:
+        raise sender.errors[0]
+    failed = sorted(sender.failed)
+    # Chunks left behind by a broken connection
+    while not pending.empty():
+        failed.append(pending.get())
+    return TransferReport(transfer_id, len(tree.leaves), tree.size, sender.resent, sorted(failed),
+                          time.perf_counter() - start)
+
+class ChunkSender:
+    ''' One transfer, shared by the threads of its streams '''
+
+    def __init__(self, filename: str, address: tuple, transfer_id: str, tree: MerkleTree,
+                 pending: queue.SimpleQueue, retries: int):
+        self.filename = filename
+        self.address = address
+        self.tree = tree
+        self.pending = pending
+        self.retries = retries
+        self.hello = (json.dumps({"transferId": transfer_id, "dataHash": str(tree.data_hash),
+                                  "size": tree.size, "chunkSize": tree.chunk_size}) + "\n").encode("utf-8")
+        self.attempts = {}
+        self.failed = []
+        self.errors = []
+        self.sent = 0
+        self.resent = 0
+        self.lock = threading.Lock()
+
+    def run(self):
+        try:
+            with socket.create_connection(self.address) as sock, open(self.filename, "rb") as f:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.sendall(self.hello)
+                if recv_exact(sock, 1) != ACK:
+                    raise ConnectionRefusedError(f"Transfer refused by {self.address}")
+                while True:
+                    try:
+                        index = self.pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        accepted = self.send_chunk(sock, f, index)
+                    except BaseException:
+                        self.pending.put(index)
+                        raise
+                    self.done(index, accepted)
+        except OSError as err:
+            with self.lock:
+                self.errors.append(err)
+
+    def send_chunk(self, sock: socket.socket, f, index: int) -> bool:
+        offset = index * self.tree.chunk_size
+        length = min(self.tree.chunk_size, self.tree.size - offset)
+        proof = self.tree.proof(index)
+        header = FRAME.pack(index, length, len(proof))
+        header += b"".join(PROOF_STEP.pack(sibling) for sibling, _ in proof)
+        sock.sendall(header)
+        sock.sendfile(f, offset, length)
+        return recv_exact(sock, 1) == ACK
+
+    def done(self, index: int, accepted: bool):
+        with self.lock:
+            if accepted:
+                self.sent += 1
+                return
+            attempts = self.attempts.get(index, 0) + 1
+            self.attempts[index] = attempts
+            if attempts > self.retries:
+                self.failed.append(index)
+                return
+            self.resent += 1
+        self.pending.put(index)
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray(size)
+    recv_into_exact(sock, memoryview(buf))
+    return bytes(buf)
+
+def recv_into_exact(sock: socket.socket, view: memoryview):
+    while len(view) > 0:
+        n = sock.recv_into(view)
+        if n == 0:
+            raise ConnectionError("Connection closed")
+        view = view[n:]
+
+class Incoming:
+    ''' A transfer being received into a file '''
+
+    def __init__(self, path: Path, data_hash: MerkleHash):
+        self.path = path
+        self.data_hash = data_hash
+        self.size = data_hash.size
+        self.chunk_size = data_hash.chunk_size
+        self.chunks = (self.size + self.chunk_size - 1) // self.chunk_size
+        self.received = set()
+        self.rejected = 0
+        self.lock = threading.Lock()
+        with open(path, "wb") as f:
+            f.truncate(self.size)
+        self.fd = os.open(path, os.O_WRONLY)
+
+    def complete(self) -> bool:
+        return len(self.received) == self.chunks
+
+    def chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def proof(self, index: int, siblings: bytes) -> list:
+        ''' The proof of the chunk index from the siblings of its frame, None if they
+        are not as many as the levels of the tree where the chunk has a sibling '''
+        shape = file_checker.proof_shape(index, self.data_hash.leaves)
+        if len(siblings) != len(shape) * PROOF_STEP.size:
+            return None
+        return [(sibling, is_left) for (sibling,), is_left in zip(PROOF_STEP.iter_unpack(siblings), shape)]
+
+    def write(self, index: int, chunk: memoryview):
+        os.pwrite(self.fd, chunk, index * self.chunk_size)
+        with self.lock:
+            self.received.add(index)
+
+    def close(self):
+        os.close(self.fd)
+
+class LoopbackReceiver:
+    ''' A local stand-in of the receiver of transfers. Chunks are checked against
+    the dataHash expected for their transfer and written into directory/transferId.
+    Transfers larger than max_size are refused. '''
+
+    def __init__(self, directory: str, host: str = "127.0.0.1", port: int = 0,
+                 max_size: int = MAX_TRANSFER_SIZE):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.expected = {}
+        self.incoming = {}
+        self.lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer((host, port), ReceiverHandler, bind_and_activate=False)
+        self.server.allow_reuse_address = True
+        self.server.daemon_threads = True
+        self.server.receiver = self
+        self.server.server_bind()
+        self.server.server_activate()
+        self.thread = None
+
+    @property
+    def address(self) -> tuple:
+        return self.server.server_address
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        with self.lock:
+            for incoming in self.incoming.values():
+                incoming.close()
+
+    def expect(self, transfer_id: str, data_hash: str):
+        ''' Accept a transfer, e.g. from the dataHash of its OPER credential.
+        ValueError if it is not a MerkleHash or is too large. '''
+        expected = MerkleHash.parse(data_hash)
+        if expected.chunk_size > MAX_CHUNK_SIZE or expected.size > self.max_size:
+            raise ValueError(f"Transfer {transfer_id} is too large: {data_hash}")
+        with self.lock:
+            self.expected[transfer_id] = expected
+
+    def open(self, hello: dict) -> Incoming:
+        ''' The transfer of a connection, None if not expected. The sizes come from
+        the expected dataHash, those of the hello must be the same. '''
+        transfer_id = hello["transferId"]
+        with self.lock:
+            expected = self.expected.get(transfer_id)
+            if (expected is None or str(expected) != hello["dataHash"] or hello["size"] != expected.size
+                    or hello["chunkSize"] != expected.chunk_size or Path(transfer_id).name != transfer_id):
+                return None
+            incoming = self.incoming.get(transfer_id)
+            if incoming is None:
+                incoming = Incoming(self.directory / transfer_id, expected)
+                self.incoming[transfer_id] = incoming
+            return incoming
+
+    def complete(self, transfer_id: str) -> bool:
+        with self.lock:
+            incoming = self.incoming.get(transfer_id)
+        return incoming is not None and incoming.complete()
+
+class ReceiverHandler(socketserver.BaseRequestHandler):
+    ''' One stream of a transfer: a hello line, then frames of chunks, each answered by ACK or NAK '''
+
+    def handle(self):
+        sock = self.request
+        try:
+            hello = json.loads(sock.makefile("rb", buffering=0).readline())
+            incoming = self.server.receiver.open(hello)
+        except (ValueError, KeyError, TypeError):
+            incoming = None
+        if incoming is None:
+            sock.sendall(NAK)
+            return
+        sock.sendall(ACK)
+        buf = bytearray(incoming.chunk_size)
+        view = memoryview(buf)
+        header = bytearray(FRAME.size)
+        while True:
+            try:
+                recv_into_exact(sock, memoryview(header))
+            except ConnectionError:
+                return
+            index, length, steps = FRAME.unpack(header)
+            if index >= incoming.chunks or length != incoming.chunk_length(index):
+                return
+            proof = incoming.proof(index, recv_exact(sock, steps * PROOF_STEP.size))
+            chunk = view[:length]
+            recv_into_exact(sock, chunk)
+            if proof is not None and file_checker.verify_chunk(incoming.data_hash, index, chunk, proof):
+                incoming.write(index, chunk)
+                sock.sendall(ACK)
+            else:
+                with incoming.lock:
+                    incoming.rejected += 1
+                sock.sendall(NAK)
+
+def main():
+    ''' Benchmark a transfer through the loopback receiver '''
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    streams = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_STREAMS
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "payload.bin")
+        with open(filename, "wb") as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1 << 20))
+        tree = MerkleTree.from_file(filename, workers=streams)
+        out_dir = os.path.join(tmp_dir, "received")
+        os.mkdir(out_dir)
+        with LoopbackReceiver(out_dir) as receiver:
+            data_hash = str(tree.data_hash)
+            receiver.expect("bench", data_hash)
+            report = send_file(filename, receiver.address, "bench", data_hash, tree, streams)
+        print(f"{report.size / 1e6:.0f} MB in {report.chunks} chunks over {streams} streams:"
+              f" {report.seconds:.2f}s, {report.throughput() / 1e6:.0f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
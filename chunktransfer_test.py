@@ -0,0 +1,97 @@
+import json
+import os
+import socket
+import tempfile
+import unittest
+
+import chunktransfer
+import file_checker
+
+class Test_ChunkTransfer(unittest.TestCase):
+    def test_loopback(self):
+        content = os.urandom(10 * 100 + 37)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "data.bin")
+            with open(filename, "wb") as f:
+                f.write(content)
+            tree = file_checker.MerkleTree.from_file(filename, chunk_size=100)
+            out_dir = os.path.join(tmp_dir, "received")
+            os.mkdir(out_dir)
+            with chunktransfer.LoopbackReceiver(out_dir) as receiver:
+                with self.assertRaises(ConnectionRefusedError):
+                    chunktransfer.send_file(filename, receiver.address, "t1", tree=tree)
+                receiver.expect("t1", str(tree.data_hash))
+                with self.assertRaises(ValueError):
+                    chunktransfer.send_file(filename, receiver.address, "t1", "other", tree=tree)
+                with self.assertRaises(ValueError):
+                    chunktransfer.send_file(filename, receiver.address, "t1", tree.root)
+
+                report = chunktransfer.send_file(filename, receiver.address, "t1", str(tree.data_hash), tree, streams=3)
+                self.assertTrue(report.ok)
+                self.assertEqual((report.chunks, report.size, report.resent), (11, len(content), 0))
+                self.assertTrue(receiver.complete("t1"))
+                with open(os.path.join(out_dir, "t1"), "rb") as f:
+                    self.assertEqual(f.read(), content)
+
+                # A chunk changed after the dataHash was signed is rejected
+                with open(filename, "r+b") as f:
+                    f.seek(250)
+                    f.write(b"x")
+                receiver.expect("t2", str(tree.data_hash))
+                report = chunktransfer.send_file(filename, receiver.address, "t2", tree=tree, retries=2)
+                self.assertEqual((report.failed, report.resent), ([2], 2))
+                self.assertFalse(receiver.complete("t2"))
+
+                # Without a tree, it is built with the chunk size of the dataHash
+                data_hash = file_checker.merkle_data_hash(filename, 300)
+                receiver.expect("t3", data_hash)
+                report = chunktransfer.send_file(filename, receiver.address, "t3", data_hash)
+                self.assertTrue(report.ok)
+                self.assertEqual(report.chunks, 4)
+
+    def test_swapped_chunk(self):
+        content = os.urandom(10 * 100 + 37)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "data.bin")
+            with open(filename, "wb") as f:
+                f.write(content)
+            tree = file_checker.MerkleTree.from_file(filename, chunk_size=100)
+            data_hash = str(tree.data_hash)
+            hello = {"transferId": "t1", "dataHash": data_hash, "size": len(content), "chunkSize": 100}
+            out_dir = os.path.join(tmp_dir, "received")
+            os.mkdir(out_dir)
+            with chunktransfer.LoopbackReceiver(out_dir, max_size=10000) as receiver:
+                with self.assertRaises(ValueError):
+                    receiver.expect("t0", data_hash.replace(":100:", ":0:"))
+                with self.assertRaises(ValueError):
+                    receiver.expect("t0", f"merkle-blake2b:100:10001:{tree.root}")
+                receiver.expect("t1", data_hash)
+
+                # The sizes of the hello are those of the dataHash
+                self.assertEqual(self.say_hello(receiver, dict(hello, chunkSize=0)), chunktransfer.NAK)
+                self.assertEqual(self.say_hello(receiver, dict(hello, size=1 << 40)), chunktransfer.NAK)
+                self.assertEqual(self.say_hello(receiver, ["t1"]), chunktransfer.NAK)
+
+                with socket.create_connection(receiver.address) as sock:
+                    sock.sendall((json.dumps(hello) + "\n").encode("utf-8"))
+                    self.assertEqual(chunktransfer.recv_exact(sock, 1), chunktransfer.ACK)
+                    # Chunk 0 with its proof, framed as chunk 3
+                    self.assertEqual(self.send_frame(sock, 3, content[:100], tree.proof(0)), chunktransfer.NAK)
+                    self.assertEqual(self.send_frame(sock, 3, content[300:400], tree.proof(3)[:-1]),
+                                     chunktransfer.NAK)
+                    self.assertEqual(self.send_frame(sock, 3, content[300:400], tree.proof(3)), chunktransfer.ACK)
+                with open(os.path.join(out_dir, "t1"), "rb") as f:
+                    self.assertEqual(f.read(400), bytes(300) + content[300:400])
+
+    def say_hello(self, receiver: chunktransfer.LoopbackReceiver, hello) -> bytes:
+        with socket.create_connection(receiver.address) as sock:
+            sock.sendall((json.dumps(hello) + "\n").encode("utf-8"))
+            return chunktransfer.recv_exact(sock, 1)
+
+    def send_frame(self, sock: socket.socket, index: int, chunk: bytes, proof: list) -> bytes:
+        sock.sendall(chunktransfer.FRAME.pack(index, len(chunk), len(proof))
+                     + b"".join(chunktransfer.PROOF_STEP.pack(sibling) for sibling, _ in proof) + chunk)
+        return chunktransfer.recv_exact(sock, 1)
+
+if __name__ == '__main__':
+    unittest.main()
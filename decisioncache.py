@@ -0,0 +1,54 @@
+from collections import OrderedDict
+import threading
+
+class DecisionCache:
+    ''' Bounded LRU cache of decisions, keyed on the decision-relevant fields of a ticket.
+    Safe to share between threads. '''
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        ''' Cached value of the key, None if missing '''
+        with self.lock:
+            val = self.entries.get(key)
+            if val is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return val
+
+    def put(self, key, val):
+        with self.lock:
+            self.entries[key] = val
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        ''' Drop all entries, e.g. when the rules are changed. Statistics are kept. '''
+        with self.lock:
+            self.entries.clear()
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": self.hit_rate(),
+        }
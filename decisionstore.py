@@ -0,0 +1,196 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+
+from regions import RegionIndex, UNKNOWN_CODE, default_index, normalize
+from ruleset import RuleChecker, Decision
+from transettings import TranSettings, SETTING_FIELDS, parse_epoch
+
+# Tickets keep the fields of TranSettings as they are, and the expiration in epoch seconds
+TICKET_COLUMNS = SETTING_FIELDS + ("expiration",)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS tickets (
+    {" TEXT, ".join(SETTING_FIELDS)} TEXT,
+    expiration INTEGER,
+    PRIMARY KEY (ticketId)
+);
+CREATE TABLE IF NOT EXISTS decisions (
+    id INTEGER PRIMARY KEY,
+    ticket_id TEXT NOT NULL,
+    orig_area TEXT,
+    dest_area TEXT,
+    orig_region TEXT,
+    dest_region TEXT,
+    decision TEXT NOT NULL,
+    rule TEXT,
+    version TEXT,
+    judged_at REAL NOT NULL,
+    trace TEXT
+);
+CREATE INDEX IF NOT EXISTS decisions_ticket ON decisions (ticket_id);
+CREATE INDEX IF NOT EXISTS decisions_areas ON decisions (orig_area, dest_area, judged_at);
+CREATE INDEX IF NOT EXISTS decisions_pair ON decisions (orig_region, dest_region, judged_at);
+CREATE INDEX IF NOT EXISTS decisions_decision ON decisions (decision, judged_at);
+CREATE INDEX IF NOT EXISTS decisions_time ON decisions (judged_at);
+"""
+
+INSERT_TICKET = (f"INSERT OR REPLACE INTO tickets ({', '.join(TICKET_COLUMNS)})"
+                 f" VALUES ({', '.join('?' * len(TICKET_COLUMNS))})")
+DECISION_COLUMNS = ("ticket_id", "orig_area", "dest_area", "orig_region", "dest_region", "decision",
+                    "rule", "version", "judged_at", "trace")
+INSERT_DECISION = (f"INSERT INTO decisions ({', '.join(DECISION_COLUMNS)})"
+                   f" VALUES ({', '.join('?' * len(DECISION_COLUMNS))})")
+
+# Position of the expiration time in TranSettings.to_tuple()
+EXPIRATION = SETTING_FIELDS.index("expirationTime")
+
+class StoredDecision(NamedTuple):
+    ''' A decision of the store. Areas are normalized names, see area_name(),
+    regions are names of Region, judged_at is epoch seconds. '''
+    ticket_id: str
+    orig_area: str
+    dest_area: str
+    orig_region: str
+    dest_region: str
+    decision: Decision
+    rule: str
+    version: str
+    judged_at: float
+    trace: list
+
+class DecisionStore:
+    ''' Tickets and their decisions in a SQLite file, with indexes on the ticket id,
+    the area pair, the region pair, the decision and the time. A ticket is stored once, each
+    judgement of it is a decision. Safe to share between threads. '''
+
+    def __init__(self, filename: str = ":memory:"):
+        self.conn = sqlite3.connect(filename, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA cache_size=-65536")
+            self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def judge_many(self, checker: RuleChecker, reqs, traces: dict = None) -> list:
+        ''' Judge and store requests. Returns the verdicts. '''
+        reqs = list(reqs)
+        book = checker.book
+        verdicts = checker.explain_many(reqs)
+        self.record_many(book, reqs, verdicts, traces=traces)
+        return verdicts
+
+    def record_many(self, book, reqs: list, verdicts: list, judged_at: float = None, traces: dict = None):
+        ''' Store requests and their verdicts in one transaction. The requests
+        are prepared against book (RuleBook.prepare()) for their regions.
+        traces: ticketId => trace records (see tracing.MemorySink) '''
+        if judged_at is None:
+            judged_at = time.time()
+        regions = [info.region.name for info in book.index.infos]
+        tickets = []
+        decisions = []
+        for req, verdict in zip(reqs, verdicts):
+            book.prepare(req)
+            ts = req.trans_props
+            ticket_id = ts.ticketId
+            values = ts.to_tuple()
+            tickets.append(values + (parse_epoch(values[EXPIRATION]),))
+            orig_code, dest_code = req.region_codes
+            trace = None
+            if traces is not None and ticket_id in traces:
+                trace = json.dumps(traces[ticket_id], default=str)
+            decisions.append((ticket_id, area_name(book.index, ts.origArea), area_name(book.index, ts.destArea),
+                              regions[orig_code], regions[dest_code],
+                              verdict.decision.name, verdict.rule, verdict.version, judged_at, trace))
+        with self.lock, self.conn:
+            self.conn.executemany(INSERT_TICKET, tickets)
+            self.conn.executemany(INSERT_DECISION, decisions)
+
+    def find(self, ticket_id: str = None, orig: str = None, dest: str = None,
+             decision: Decision = None, since: float = None, until: float = None,
+             limit: int = None, orig_area: str = None, dest_area: str = None) -> list:
+        ''' Decisions matching all given conditions, the latest first.
+        orig/dest: names of Region, e.g. "CHINA"; orig_area/dest_area: areas, e.g.
+        "Israel", resolved as by area_name() in the default index; since/until: epoch seconds '''
+        if orig_area is not None:
+            orig_area = area_name(default_index(), orig_area)
+        if dest_area is not None:
+            dest_area = area_name(default_index(), dest_area)
+        conds = []
+        params = []
+        for column, val in (("ticket_id", ticket_id), ("orig_area", orig_area), ("dest_area", dest_area),
+                            ("orig_region", orig), ("dest_region", dest)):
+            if val is not None:
+                conds.append(f"{column} = ?")
+                params.append(val)
+        if decision is not None:
+            conds.append("decision = ?")
+            params.append(decision.name)
+        if since is not None:
+            conds.append("judged_at >= ?")
+            params.append(since)
+        if until is not None:
+            conds.append("judged_at < ?")
+            params.append(until)
+
+        sql = f"SELECT {', '.join(DECISION_COLUMNS)} FROM decisions"
+        if conds:
+            sql += " WHERE " + " AND ".join(conds)
+        sql += " ORDER BY judged_at DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [stored_decision(row) for row in rows]
+
+    def latest(self, ticket_id: str) -> StoredDecision:
+        ''' The last decision of a ticket, None if never judged '''
+        found = self.find(ticket_id=ticket_id, limit=1)
+        if len(found) == 0:
+            return None
+        return found[0]
+
+    def settings(self, ticket_id: str) -> TranSettings:
+        ''' The stored ticket, None if missing '''
+        with self.lock:
+            row = self.conn.execute(f"SELECT {', '.join(SETTING_FIELDS)} FROM tickets WHERE ticketId = ?",
+                                    (ticket_id,)).fetchone()
+        if row is None:
+            return None
+        return TranSettings.from_tuple(row)
+
+    def count(self, decision: Decision = None) -> int:
+        sql = "SELECT COUNT(*) FROM decisions"
+        params = []
+        if decision is not None:
+            sql += " WHERE decision = ?"
+            params.append(decision.name)
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()[0]
+
+def stored_decision(row: tuple) -> StoredDecision:
+    ticket_id, orig_area, dest_area, orig, dest, decision, rule, version, judged_at, trace = row
+    return StoredDecision(ticket_id, orig_area, dest_area, orig, dest, Decision[decision], rule, version,
+                          judged_at, None if trace is None else json.loads(trace))
+
+def area_name(index: RegionIndex, desc: str) -> str:
+    ''' The name of a known area (the first of its aliases), else the normalized
+    description, so areas outside every jurisdiction are told apart '''
+    code = index.code(desc)
+    if code == UNKNOWN_CODE:
+        return normalize(desc)
+    return index.infos[code].name
@@ -0,0 +1,55 @@
+from pathlib import Path
+import tempfile
+import unittest
+
+import decisionstore
+import ruleset
+from ruleset_test import make_ticket
+
+class Test_DecisionStore(unittest.TestCase):
+    def test_find(self):
+        reqs = [make_ticket(orig, dest, reason)
+                for orig in ["China", "Germany", "India"]
+                for dest in ["USA", "Japan", "Israel"]
+                for reason in ["local storage", "none"]]
+        checker = ruleset.RuleChecker()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with decisionstore.DecisionStore(str(Path(tmp_dir) / "decisions.db")) as store:
+                traces = {reqs[0].trans_props.ticketId: [{"event": "rule", "msg": "first"}]}
+                verdicts = store.judge_many(checker, reqs, traces=traces)
+                self.assertEqual(verdicts, checker.explain_many(reqs))
+                self.assertEqual(store.count(), len(reqs))
+                self.assertEqual(len(store.find(dest_area="usa")), len(store.find(dest_area=" The United States")))
+
+                tbds = store.find(orig="INDIA", dest="USA", decision=ruleset.Decision.TBD)
+                self.assertEqual([found.ticket_id for found in tbds], ["India-USA-none"])
+                self.assertEqual(len(store.find(orig="INDIA", decision=ruleset.Decision.TBD)), 3)
+                self.assertEqual(store.find(orig="CHINA", decision=ruleset.Decision.TBD), [])
+
+                # Areas outside every jurisdiction are kept apart
+                more = [make_ticket("China", dest, "none") for dest in ["Switzerland", "Mars", " MARS"]]
+                store.judge_many(checker, more)
+                israel = store.find(orig_area="china", dest_area="Israel")
+                self.assertEqual({found.ticket_id for found in israel}, {"China-Israel-local storage", "China-Israel-none"})
+                self.assertEqual((israel[0].orig_region, israel[0].dest_region), ("CHINA", "UNKNOWN"))
+                self.assertEqual(len(store.find(dest_area="mars")), 2)
+                self.assertEqual(len(store.find(orig="CHINA", dest="UNKNOWN")), 2 + 3)
+                self.assertEqual(len(store.find(dest_area="United Kingdom")), 0)
+
+                # Judged again later, the latest decision comes first
+                later = tbds[0].judged_at + 60
+                store.record_many(checker.book, reqs[:1], verdicts[:1], judged_at=later)
+                latest = store.latest(reqs[0].trans_props.ticketId)
+                self.assertEqual(latest.judged_at, later)
+                self.assertIsNone(latest.trace)
+                self.assertEqual(latest.version, checker.book.version)
+                first = store.find(ticket_id=reqs[0].trans_props.ticketId, until=later)
+                self.assertEqual([found.trace for found in first], [traces[reqs[0].trans_props.ticketId]])
+                self.assertEqual(len(store.find(since=later)), 1)
+                self.assertIsNone(store.latest("missing"))
+
+                ts = store.settings(reqs[1].trans_props.ticketId)
+                self.assertEqual(ts.to_tuple(), reqs[1].trans_props.to_tuple())
+
+if __name__ == '__main__':
+    unittest.main()
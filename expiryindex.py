@@ -0,0 +1,141 @@
+import heapq
+import itertools
+import threading
+import time
+
+from transettings import TranSettings, parse_epoch
+
+# Kinds of keys in the index
+TICKET = "ticket"
+USER = "user"
+
+# Entry of the heap: [epoch, sequence, key, item, alive]
+EPOCH, SEQ, KEY, ITEM, ALIVE = range(5)
+
+class ExpiryIndex:
+    ''' Tickets and credentials ordered by their expiration (epoch seconds),
+    in a min-heap. Removed entries are only marked and dropped lazily, the heap
+    is compacted when they are the majority. Safe to share between threads. '''
+
+    def __init__(self):
+        self.heap = []
+        self.entries = {}
+        self.dead = 0
+        self.seq = itertools.count()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def insert(self, key, epoch: int, item=None):
+        ''' Add an entry, or move it if the key is already indexed. O(log n) '''
+        with self.lock:
+            self.drop(key)
+            entry = [epoch, next(self.seq), key, item, True]
+            self.entries[key] = entry
+            heapq.heappush(self.heap, entry)
+
+    def remove(self, key) -> bool:
+        ''' Remove an entry. False if the key is not indexed. '''
+        with self.lock:
+            return self.drop(key)
+
+    def drop(self, key) -> bool:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[ALIVE] = False
+        self.dead += 1
+        if self.dead > 64 and self.dead > len(self.heap) // 2:
+            self.heap = [entry for entry in self.heap if entry[ALIVE]]
+            heapq.heapify(self.heap)
+            self.dead = 0
+        return True
+
+    def next_expiry(self) -> int:
+        ''' The earliest expiration, None if empty '''
+        with self.lock:
+            self.drop_dead_top()
+            if len(self.heap) == 0:
+                return None
+            return self.heap[0][EPOCH]
+
+    def drop_dead_top(self):
+        while self.heap and self.heap[0][ALIVE] is False:
+            heapq.heappop(self.heap)
+            self.dead -= 1
+
+    def expiring(self, until: float) -> list:
+        ''' [(epoch, key, item)] which expire at or before until, earliest first.
+        Only the part of the heap above until is visited. '''
+        found = []
+        with self.lock:
+            heap = self.heap
+            pending = [0] if heap else []
+            while pending:
+                i = pending.pop()
+                entry = heap[i]
+                if entry[EPOCH] > until:
+                    # Its children expire even later
+                    continue
+                if entry[ALIVE]:
+                    found.append((entry[EPOCH], entry[SEQ], entry[KEY], entry[ITEM]))
+                for child in (2 * i + 1, 2 * i + 2):
+                    if child < len(heap):
+                        pending.append(child)
+        found.sort()
+        return [(epoch, key, item) for epoch, _, key, item in found]
+
+    def expiring_within(self, hours: float, now: float = None) -> list:
+        ''' What expires in the next hours, see expiring() '''
+        if now is None:
+            now = time.time()
+        return self.expiring(now + hours * 3600)
+
+    def sweep(self, now: float = None, renew=None) -> list:
+        ''' Take out everything expired before now. renew(key, item) may return a
+        new expiration in the future to keep an entry, otherwise it is rejected.
+        Returns the rejected [(key, item)]. Only the expired entries are visited.
+        renew is called without the lock held, so it may use this index. '''
+        if now is None:
+            now = time.time()
+        expired = []
+        with self.lock:
+            while self.heap and self.heap[0][EPOCH] < now:
+                entry = heapq.heappop(self.heap)
+                if entry[ALIVE] is False:
+                    self.dead -= 1
+                    continue
+                del self.entries[entry[KEY]]
+                expired.append((entry[KEY], entry[ITEM]))
+        if renew is None:
+            return expired
+
+        rejected = []
+        for key, item in expired:
+            epoch = renew(key, item)
+            if epoch is not None and epoch >= now:
+                if key not in self:
+                    # Unless renew() indexed it again itself
+                    self.insert(key, epoch, item)
+            else:
+                rejected.append((key, item))
+        return rejected
+
+    def add_settings(self, ts: TranSettings):
+        ''' Index a ticket by its ticketId. A ticket without expiration time is
+        expired, see TranSettings.check_expiration(). '''
+        epoch = parse_epoch(getattr(ts, "expirationTime", ""))
+        self.insert((TICKET, ts.ticketId), epoch or 0, ts)
+
+    def add_credential(self, vcobj: dict) -> bool:
+        ''' Index a user credential by its subject id. Credentials without
+        expirationDate never expire and are not indexed. '''
+        epoch = parse_epoch(vcobj.get("expirationDate", ""))
+        if epoch is None:
+            return False
+        self.insert((USER, vcobj["credentialSubject"]["id"]), epoch, vcobj)
+        return True
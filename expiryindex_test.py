@@ -0,0 +1,63 @@
+import random
+import unittest
+
+import expiryindex
+import transettings
+
+class Test_ExpiryIndex(unittest.TestCase):
+    def test_heap(self):
+        rng = random.Random(3)
+        index = expiryindex.ExpiryIndex()
+        epochs = {}
+        for i in range(500):
+            epochs[i] = rng.randrange(1000, 100000)
+            index.insert(i, epochs[i])
+        for i in range(0, 500, 3):
+            self.assertTrue(index.remove(i))
+            del epochs[i]
+        self.assertFalse(index.remove(0))
+        self.assertEqual(len(index), len(epochs))
+        self.assertEqual(index.next_expiry(), min(epochs.values()))
+
+        soon = index.expiring(20000)
+        self.assertEqual([key for _, key, _ in soon],
+                         sorted((k for k, v in epochs.items() if v <= 20000), key=lambda k: (epochs[k], k)))
+        self.assertEqual(index.expiring_within(5, now=1000), index.expiring(1000 + 5 * 3600))
+
+        # Keys below 100 are renewed once
+        renewed = set()
+        def renew(key, item):
+            if key < 100 and key not in renewed:
+                renewed.add(key)
+                return 200000
+            return None
+        rejected = index.sweep(now=50000, renew=renew)
+        expired = {k for k, v in epochs.items() if v < 50000}
+        self.assertEqual({key for key, _ in rejected}, expired - renewed)
+        self.assertEqual(len(index), len(epochs) - len(expired - renewed))
+        self.assertGreaterEqual(index.next_expiry(), 50000)
+
+    def test_tickets(self):
+        index = expiryindex.ExpiryIndex()
+        for ts in transettings.TransGenerator(seed=1).iter_settings(5):
+            index.add_settings(ts)
+        ts.expirationTime = ""
+        index.add_settings(ts)
+        self.assertTrue(index.add_credential({"expirationDate": "2000-01-01T00:00:00Z",
+                                              "credentialSubject": {"id": "did:key:u1"}}))
+        self.assertFalse(index.add_credential({"expirationDate": "", "credentialSubject": {"id": "did:key:u2"}}))
+        rejected = index.sweep()
+        self.assertEqual([key for key, _ in rejected], [("ticket", ts.ticketId), ("user", "did:key:u1")])
+        self.assertEqual(len(index), 4)
+
+        # renew() may use the index, e.g. to index the renewed credential itself
+        index.add_credential({"expirationDate": "2000-01-01T00:00:00Z", "credentialSubject": {"id": "did:key:u3"}})
+        def renew(key, item):
+            index.insert(key, 4000000000, item)
+            return 4000000000
+        self.assertEqual(index.sweep(renew=renew), [])
+        self.assertEqual(index.expiring(4000000000)[-1][1], ("user", "did:key:u3"))
+        self.assertEqual(len(index), 5)
+
+if __name__ == '__main__':
+    unittest.main()
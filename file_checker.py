@@ -1,52 +1,303 @@
 import hashlib
 import base64
+import json
+import os
+import struct
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import NamedTuple
 
-def hash_file(filename: str):
-    ''' Hash a file, using BLAKE hash algorithm '''
-    with open(filename, "rb") as f:
-        content = f.read()
-        f.close()
-    h = hashlib.blake2b(digest_size=20)
-    h.update(content)
-    res = h.digest()
-
-    base64_bytes = base64.b64encode(res) 
-    base64_string = base64_bytes.decode("ascii")   
-    print(f"Encoded Hash for file {filename}: {base64_string}")
-
-def hash_file_sha256(filename: str):
-    ''' Hash a file, using SHA256 algorithm '''
-    with open(filename,"rb") as f:
-        bytes1 = f.read() # read entire file as bytes
-    readable_hash = hashlib.sha256(bytes1).hexdigest()
-    print(readable_hash)
-    
-    base64_bytes = base64.b64encode(hashlib.sha256(bytes1).digest())
-    base64_string = base64_bytes.decode("ascii")
-    print(f"Encoded Hash for file {filename}: {base64_string}")
-
-def hash_obj(content: str):
+# Bytes read at once while hashing a file
+CHUNK_SIZE = 1 << 20
+# Size of BLAKE2b digests, as in TranSettings.dataHash
+BLAKE_DIGEST_SIZE = 20
+# Size of the chunks of a Merkle tree, the last chunk may be shorter
+MERKLE_CHUNK_SIZE = 4 << 20
+# Prefixes of leaves, inner nodes and the root of a Merkle tree, so one cannot pass for another
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+ROOT_PREFIX = b"\x02"
+# Chunk size and file size, hashed into the root of a Merkle tree
+ROOT_SHAPE = struct.Struct("!QQ")
+# Scheme of a dataHash made by MerkleHash
+MERKLE_SCHEME = "merkle-blake2b"
+
+# Read buffer of each thread, reused by every file it hashes
+buffers = threading.local()
+
+class FileDigests(NamedTuple):
+    ''' Digests of a file, in base64 '''
+    sha256: str
+    blake2b: str
+    size: int
+
+def file_digests(filename: str, chunk_size: int = CHUNK_SIZE) -> FileDigests:
+    ''' SHA-256 and BLAKE2b of a file in one pass. Only chunk_size bytes are in memory at once. '''
+    sha = hashlib.sha256()
+    blake = hashlib.blake2b(digest_size=BLAKE_DIGEST_SIZE)
+    buf = read_buffer(chunk_size)
+    view = memoryview(buf)
+    size = 0
+    with open(filename, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            chunk = view[:n]
+            sha.update(chunk)
+            blake.update(chunk)
+            size += n
+    return FileDigests(encode(sha.digest()), encode(blake.digest()), size)
+
+def read_buffer(chunk_size: int) -> bytearray:
+    ''' The read buffer of this thread, of chunk_size bytes '''
+    buf = getattr(buffers, "buf", None)
+    if buf is None or len(buf) != chunk_size:
+        buf = bytearray(chunk_size)
+        buffers.buf = buf
+    return buf
+
+class ManifestEntry(NamedTuple):
+    ''' A file of a manifest, path is relative to the hashed directory '''
+    path: str
+    size: int
+    sha256: str
+    blake2b: str
+
+class Manifest(NamedTuple):
+    ''' Files of a directory, in the order of their paths, and their combined digest '''
+    files: list
+    data_hash: str
+
+    def to_json(self) -> dict:
+        return {"dataHash": self.data_hash, "files": [entry._asdict() for entry in self.files]}
+
+    @classmethod
+    def from_json(cls, jo: dict) -> 'Manifest':
+        return cls([ManifestEntry(**entry) for entry in jo["files"]], jo["dataHash"])
+
+def hash_tree(root: str, workers: int = None, chunk_size: int = CHUNK_SIZE, cache=None) -> Manifest:
+    ''' Hash all files under root on a pool of workers threads (hashlib releases the GIL
+    while hashing). At most workers * chunk_size bytes are in memory at once.
+    cache: a hashcache.HashCache, only the files changed since are read '''
+    root = Path(root)
+    paths = list_files(root)
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) * 2)
+    digest = file_digests if cache is None else cache.file_digests
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        digests = list(executor.map(lambda path: digest(path, chunk_size), paths))
+    files = [ManifestEntry(path.relative_to(root).as_posix(), found.size, found.sha256, found.blake2b)
+             for path, found in zip(paths, digests)]
+    return Manifest(files, manifest_digest(files))
+
+def list_files(root: Path) -> list:
+    ''' Regular files under root, sorted by their relative paths '''
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in filenames:
+            path = Path(dirpath) / name
+            if path.is_file():
+                found.append(path)
+    found.sort(key=lambda path: path.relative_to(root).as_posix())
+    return found
+
+def manifest_digest(files: list) -> str:
+    ''' One BLAKE2b over the paths, sizes and digests of the files, for TranSettings.dataHash.
+    Each file is one JSON line, so no path can pass for another file. '''
+    h = hashlib.blake2b(digest_size=BLAKE_DIGEST_SIZE)
+    for entry in files:
+        h.update((json.dumps([entry.path, entry.size, entry.blake2b]) + "\n").encode("utf-8"))
+    return encode(h.digest())
+
+def write_manifest(filename: str, manifest: Manifest):
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(manifest.to_json(), f, indent=2)
+
+def read_manifest(filename: str) -> Manifest:
+    with open(filename, "r", encoding="utf-8") as f:
+        return Manifest.from_json(json.load(f))
+
+class MerkleHash(NamedTuple):
+    ''' dataHash of a file sent in chunks: the root of its MerkleTree, which is bound
+    to the chunk size and the file size. As text it names its scheme and both
+    sizes, so a verifier knows how to recompute it. '''
+    chunk_size: int
+    size: int
+    root: str
+
+    @property
+    def leaves(self) -> int:
+        return chunk_count(self.size, self.chunk_size)
+
+    def __str__(self) -> str:
+        return f"{MERKLE_SCHEME}:{self.chunk_size}:{self.size}:{self.root}"
+
+    @classmethod
+    def parse(cls, text: str) -> 'MerkleHash':
+        ''' Back from str(), ValueError for other kinds of dataHash '''
+        parts = text.split(":")
+        if len(parts) != 4 or parts[0] != MERKLE_SCHEME:
+            raise ValueError(f"Not a {MERKLE_SCHEME} dataHash: {text}")
+        chunk_size, size = int(parts[1]), int(parts[2])
+        if chunk_size <= 0 or size < 0:
+            raise ValueError(f"Invalid sizes of a dataHash: {text}")
+        return cls(chunk_size, size, parts[3])
+
+class MerkleTree:
+    ''' A Merkle tree of BLAKE2b over the fixed-size chunks of a file. Its data_hash is
+    the dataHash of a transfer. A chunk is verified alone with its proof(), so
+    chunks can be checked and sent again independently. '''
+
+    def __init__(self, leaves: list, chunk_size: int = MERKLE_CHUNK_SIZE, size: int = 0):
+        self.chunk_size = chunk_size
+        self.size = size
+        if len(leaves) == 0:
+            leaves = [leaf_hash(b"")]
+        self.levels = [list(leaves)]
+        while len(self.levels[-1]) > 1:
+            below = self.levels[-1]
+            level = [node_hash(below[i], below[i + 1]) for i in range(0, len(below) - 1, 2)]
+            if len(below) % 2 == 1:
+                # An odd node moves up as it is
+                level.append(below[-1])
+            self.levels.append(level)
+
+    @classmethod
+    def from_file(cls, filename: str, chunk_size: int = MERKLE_CHUNK_SIZE, workers: int = 1) -> 'MerkleTree':
+        ''' Hash the chunks of a file, on workers threads if more than one '''
+        size = os.path.getsize(filename)
+        offsets = range(0, size, chunk_size)
+        with open(filename, "rb", buffering=0) as f:
+            def hash_chunk(offset: int) -> bytes:
+                return leaf_hash(os.pread(f.fileno(), chunk_size, offset))
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    leaves = list(executor.map(hash_chunk, offsets))
+            else:
+                leaves = [hash_chunk(offset) for offset in offsets]
+        return cls(leaves, chunk_size, size)
+
+    @property
+    def leaves(self) -> list:
+        return self.levels[0]
+
+    @property
+    def root(self) -> str:
+        ''' The root in base64, bound to the chunk size and the size '''
+        return encode(root_hash(self.levels[-1][0], self.chunk_size, self.size))
+
+    @property
+    def data_hash(self) -> MerkleHash:
+        ''' str() of it is the dataHash of the file '''
+        return MerkleHash(self.chunk_size, self.size, self.root)
+
+    def proof(self, index: int) -> list:
+        ''' [(sibling, sibling is on the left)] from the leaf of chunk index up to the root,
+        see proof_shape() '''
+        path = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                path.append((level[sibling], sibling < index))
+            index //= 2
+        return path
+
+    def bad_chunks(self, filename: str, workers: int = 1) -> list:
+        ''' Indexes of the chunks of a file which differ from this tree '''
+        other = MerkleTree.from_file(filename, self.chunk_size, workers)
+        return [i for i, leaf in enumerate(self.leaves) if i >= len(other.leaves) or other.leaves[i] != leaf]
+
+def chunk_count(size: int, chunk_size: int) -> int:
+    ''' Leaves of the MerkleTree of a file, an empty file has one empty chunk '''
+    return max(1, (size + chunk_size - 1) // chunk_size)
+
+def proof_shape(index: int, leaves: int) -> list:
+    ''' Whether each sibling of the proof of a leaf is on the left. Levels where the
+    node is an odd last one have no sibling: the node moves up as it is. '''
+    shape = []
+    while leaves > 1:
+        sibling = index ^ 1
+        if sibling < leaves:
+            shape.append(sibling < index)
+        index //= 2
+        leaves = (leaves + 1) // 2
+    return shape
+
+def leaf_hash(chunk: bytes) -> bytes:
+    h = hashlib.blake2b(LEAF_PREFIX, digest_size=BLAKE_DIGEST_SIZE)
+    h.update(chunk)
+    return h.digest()
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.blake2b(NODE_PREFIX + left + right, digest_size=BLAKE_DIGEST_SIZE).digest()
+
+def root_hash(top: bytes, chunk_size: int, size: int) -> bytes:
+    return hashlib.blake2b(ROOT_PREFIX + top + ROOT_SHAPE.pack(chunk_size, size),
+                           digest_size=BLAKE_DIGEST_SIZE).digest()
+
+def verify_chunk(data_hash: MerkleHash, index: int, chunk: bytes, proof: list) -> bool:
+    ''' Check that chunk is the chunk index of the file of data_hash, with the proof of
+    that index. The proof must have the shape of the index in a tree of
+    data_hash.leaves leaves, so a chunk cannot pass for another one. '''
+    leaves = data_hash.leaves
+    if index < 0 or index >= leaves:
+        return False
+    expected = min(data_hash.chunk_size, data_hash.size - index * data_hash.chunk_size)
+    if len(chunk) != expected:
+        return False
+    shape = proof_shape(index, leaves)
+    if len(proof) != len(shape):
+        return False
+    h = leaf_hash(chunk)
+    for (sibling, is_left), expected_left in zip(proof, shape):
+        if is_left != expected_left:
+            return False
+        h = node_hash(sibling, h) if is_left else node_hash(h, sibling)
+    return encode(root_hash(h, data_hash.chunk_size, data_hash.size)) == data_hash.root
+
+def merkle_data_hash(filename: str, chunk_size: int = MERKLE_CHUNK_SIZE, workers: int = 1) -> str:
+    ''' The dataHash of a file for a transfer in chunks, see MerkleHash '''
+    return str(MerkleTree.from_file(filename, chunk_size, workers).data_hash)
+
+def hash_file(filename: str, chunk_size: int = CHUNK_SIZE) -> str:
+    ''' Hash a file, using BLAKE hash algorithm. Returns the hash in base64, as TranSettings.dataHash '''
+    return file_digests(filename, chunk_size).blake2b
+
+def hash_file_sha256(filename: str, chunk_size: int = CHUNK_SIZE) -> str:
+    ''' Hash a file, using SHA256 algorithm. Returns the hash in base64 '''
+    return file_digests(filename, chunk_size).sha256
+
+def hash_obj(content: str) -> str:
     ''' Hash a string, using BLAKE hash algorithm '''
-    h = hashlib.blake2b(digest_size=20)
+    h = hashlib.blake2b(digest_size=BLAKE_DIGEST_SIZE)
     h.update(content.encode('utf-8'))
-    res = h.digest()
-        
-    base64_bytes = base64.b64encode(res) 
-    base64_string = base64_bytes.decode("ascii")   
-    print(f"Encoded string: {base64_string}")
+    return encode(h.digest())
+
+def encode(digest: bytes) -> str:
+    return base64.b64encode(digest).decode("ascii")
 
 def main():
     #hash_file("user2.json")
     #hash_file("1.jpg")
-    if len(sys.argv) != 2:
-        print("Usage: python file.py [filepath]")
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python file.py [filepath or directory] [manifest]")
         return
     fullpath = sys.argv[1]
     origfile = Path(fullpath)
-    if origfile.exists:
-        hash_file_sha256(fullpath)
+    if origfile.is_dir():
+        manifest = hash_tree(fullpath)
+        if len(sys.argv) == 3:
+            write_manifest(sys.argv[2], manifest)
+        print(f"Encoded Hash for {len(manifest.files)} files in {fullpath}: {manifest.data_hash}")
+    elif origfile.exists():
+        digests = file_digests(fullpath)
+        print(base64.b64decode(digests.sha256).hex())
+        print(f"Encoded Hash for file {fullpath}: {digests.sha256}")
+        print(f"Encoded BLAKE2b hash for file {fullpath}: {digests.blake2b}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+import base64
+import hashlib
+import os
+import tempfile
+import file_checker
+import unittest
+
+class Test_FileChecker(unittest.TestCase):
+    def test_file_digests(self):
+        content = os.urandom(3 * 1024 + 17)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "data.bin")
+            with open(filename, "wb") as f:
+                f.write(content)
+            for chunk_size in [1, 1000, 1024, 1 << 20]:
+                digests = file_checker.file_digests(filename, chunk_size)
+                self.assertEqual(digests.sha256, base64.b64encode(hashlib.sha256(content).digest()).decode())
+                self.assertEqual(digests.blake2b,
+                                 base64.b64encode(hashlib.blake2b(content, digest_size=20).digest()).decode())
+                self.assertEqual(digests.size, len(content))
+            self.assertEqual(file_checker.hash_file(filename), digests.blake2b)
+            self.assertEqual(file_checker.hash_file_sha256(filename), digests.sha256)
+            # The format of TranSettings.dataHash
+            self.assertEqual(len(file_checker.hash_file(filename)), 28)
+
+    def test_hash_tree(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = os.path.join(tmp_dir, "data")
+            os.makedirs(os.path.join(root, "b", "c"))
+            names = ["a.bin", "b/x.bin", "b/c/y.bin", "z.bin"]
+            for i, name in enumerate(names):
+                with open(os.path.join(root, name), "wb") as f:
+                    f.write(os.urandom(1000 * i + 1))
+
+            manifest = file_checker.hash_tree(root, workers=4, chunk_size=256)
+            self.assertEqual([entry.path for entry in manifest.files], sorted(names))
+            for entry in manifest.files:
+                self.assertEqual(entry.blake2b, file_checker.hash_file(os.path.join(root, entry.path)))
+            self.assertEqual(file_checker.hash_tree(root, workers=1), manifest)
+
+            filename = os.path.join(tmp_dir, "manifest.json")
+            file_checker.write_manifest(filename, manifest)
+            self.assertEqual(file_checker.read_manifest(filename), manifest)
+
+            os.rename(os.path.join(root, "z.bin"), os.path.join(root, "w.bin"))
+            self.assertNotEqual(file_checker.hash_tree(root).data_hash, manifest.data_hash)
+
+        # A path with tabs and newlines cannot pass for other files
+        entry = file_checker.ManifestEntry
+        self.assertNotEqual(file_checker.manifest_digest([entry("a", 1, "", "h1"), entry("b", 2, "", "h2")]),
+                            file_checker.manifest_digest([entry("a\t1\th1\nb", 2, "", "h2")]))
+        self.assertIs(file_checker.read_buffer(256), file_checker.read_buffer(256))
+
+    def test_merkle_tree(self):
+        content = os.urandom(10 * 100 + 37)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "data.bin")
+            with open(filename, "wb") as f:
+                f.write(content)
+            tree = file_checker.MerkleTree.from_file(filename, chunk_size=100)
+            self.assertEqual(len(tree.leaves), 11)
+            self.assertEqual(file_checker.MerkleTree.from_file(filename, 100, workers=4).root, tree.root)
+            data_hash = file_checker.merkle_data_hash(filename, 100)
+            self.assertEqual(data_hash, f"merkle-blake2b:100:{len(content)}:{tree.root}")
+            self.assertEqual(file_checker.MerkleHash.parse(data_hash), tree.data_hash)
+            self.assertEqual(tree.data_hash.leaves, 11)
+            self.assertNotEqual(file_checker.MerkleTree.from_file(filename, 200).root, tree.root)
+            with self.assertRaises(ValueError):
+                file_checker.MerkleHash.parse(tree.root)
+
+            for i in range(len(tree.leaves)):
+                chunk = content[i * 100:(i + 1) * 100]
+                self.assertEqual([is_left for _, is_left in tree.proof(i)], file_checker.proof_shape(i, 11))
+                self.assertTrue(file_checker.verify_chunk(tree.data_hash, i, chunk, tree.proof(i)))
+                self.assertFalse(file_checker.verify_chunk(tree.data_hash, i, chunk[:-1], tree.proof(i)))
+            # A chunk with its own proof does not pass for another index
+            self.assertFalse(file_checker.verify_chunk(tree.data_hash, 1, content[:100], tree.proof(1)))
+            self.assertFalse(file_checker.verify_chunk(tree.data_hash, 3, content[:100], tree.proof(0)))
+            self.assertFalse(file_checker.verify_chunk(tree.data_hash, 11, content[1000:], tree.proof(10)))
+            flipped = [(sibling, not is_left) for sibling, is_left in tree.proof(0)]
+            self.assertFalse(file_checker.verify_chunk(tree.data_hash, 0, content[:100], flipped))
+            self.assertFalse(file_checker.verify_chunk(tree.data_hash, 0, content[:100], tree.proof(0)[:-1]))
+            # The last chunk is an odd node on two of the four levels
+            self.assertEqual(file_checker.proof_shape(10, 11), [True, True])
+            self.assertTrue(file_checker.verify_chunk(tree.data_hash, 10, content[1000:], tree.proof(10)))
+            # The root is bound to the sizes of the tree
+            other = file_checker.MerkleHash(100, len(content) - 1, tree.root)
+            self.assertFalse(file_checker.verify_chunk(other, 0, content[:100], tree.proof(0)))
+
+            # Only the corrupted chunks are sent again
+            damaged = bytearray(content)
+            damaged[250] ^= 1
+            damaged[1010] ^= 1
+            with open(filename, "wb") as f:
+                f.write(damaged)
+            self.assertEqual(tree.bad_chunks(filename), [2, 10])
+
+        empty = file_checker.MerkleTree([])
+        self.assertEqual(empty.data_hash.leaves, 1)
+        self.assertTrue(file_checker.verify_chunk(empty.data_hash, 0, b"", empty.proof(0)))
+
+if __name__ == '__main__':
+    unittest.main()
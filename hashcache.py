@@ -0,0 +1,153 @@
+from collections import OrderedDict
+import os
+import pickle
+import tempfile
+import threading
+from pathlib import Path
+
+import file_checker
+
+# Where to persist the cache, when asked to. Per user, as rulebook.DEFAULT_CACHE_DIR:
+# a pickle runs code when it is loaded.
+DEFAULT_HASH_CACHE = (Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+                      / "trans-border" / "hashes.pickle")
+
+# Kinds of digests in the cache
+DIGESTS = "digests"
+MERKLE = "merkle"
+
+class HashCache:
+    ''' Bounded LRU cache of file digests, persisted in a file. An entry is found
+    by the path of a file and kept only while its size, mtime and inode are the
+    same, so only changed files are read again. Safe to share between threads. '''
+
+    def __init__(self, filename=None, capacity: int = 100000):
+        ''' filename: where the cache is persisted, e.g. DEFAULT_HASH_CACHE.
+        None keeps the cache in memory only. '''
+        self.filename = None if filename is None else Path(filename)
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.changed = False
+        self.lock = threading.Lock()
+        self.load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.save()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self):
+        ''' Entries of the cache file. A missing or broken file is an empty cache. '''
+        if self.filename is None:
+            return
+        try:
+            with open(self.filename, "rb") as f:
+                entries = OrderedDict(pickle.load(f))
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, TypeError, ValueError):
+            return
+        with self.lock:
+            self.entries = entries
+            self.evict()
+
+    def save(self):
+        ''' Written to a temporary file and renamed, as rulebook.save_book().
+        The cache is an optimization: failures are ignored. '''
+        if self.filename is None or self.changed is False:
+            return
+        with self.lock:
+            entries = list(self.entries.items())
+            self.changed = False
+        try:
+            self.filename.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.filename.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_name, self.filename)
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+        except OSError:
+            pass
+
+    def get(self, kind: str, filename: str):
+        ''' Cached digest of an unchanged file, None if missing '''
+        key = (kind, os.path.abspath(filename))
+        stamp = file_stamp(filename)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != stamp:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, kind: str, filename: str, val, stamp: tuple = None):
+        ''' stamp: file_stamp() of the file taken before it was hashed '''
+        key = (kind, os.path.abspath(filename))
+        current = file_stamp(filename)
+        if stamp is None:
+            stamp = current
+        elif stamp != current:
+            # Changed while it was hashed
+            return
+        with self.lock:
+            self.entries[key] = (stamp, val)
+            self.entries.move_to_end(key)
+            self.changed = True
+            self.evict()
+
+    def evict(self):
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+            self.changed = True
+
+    def file_digests(self, filename: str, chunk_size: int = file_checker.CHUNK_SIZE) -> file_checker.FileDigests:
+        ''' file_checker.file_digests() of a file, from the cache if unchanged '''
+        found = self.get(DIGESTS, filename)
+        if found is None:
+            stamp = file_stamp(filename)
+            found = file_checker.file_digests(filename, chunk_size)
+            self.put(DIGESTS, filename, found, stamp)
+        return found
+
+    def merkle_data_hash(self, filename: str, chunk_size: int = file_checker.MERKLE_CHUNK_SIZE,
+                         workers: int = 1) -> str:
+        ''' file_checker.merkle_data_hash() of a file, from the cache if unchanged '''
+        kind = f"{MERKLE}-{chunk_size}"
+        found = self.get(kind, filename)
+        if found is None:
+            stamp = file_stamp(filename)
+            found = file_checker.merkle_data_hash(filename, chunk_size, workers)
+            self.put(kind, filename, found, stamp)
+        return found
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": self.hit_rate(),
+        }
+
+def file_stamp(filename: str) -> tuple:
+    ''' (size, mtime_ns, inode) of a file '''
+    st = os.stat(filename)
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
@@ -0,0 +1,47 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import file_checker
+import hashcache
+
+class Test_HashCache(unittest.TestCase):
+    def test_unchanged_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            names = [os.path.join(tmp_dir, f"f{i}.bin") for i in range(3)]
+            for name in names:
+                with open(name, "wb") as f:
+                    f.write(os.urandom(1000))
+            cache_file = os.path.join(tmp_dir, "cache", "hashes.pickle")
+            with hashcache.HashCache(cache_file, capacity=2) as cache:
+                for name in names:
+                    self.assertEqual(cache.file_digests(name), file_checker.file_digests(name))
+                self.assertEqual(cache.stats()["evictions"], 1)
+                self.assertEqual(cache.file_digests(names[2]), file_checker.file_digests(names[2]))
+                self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+            # Persisted, and a changed file is read again
+            cache = hashcache.HashCache(cache_file, capacity=2)
+            self.assertEqual(len(cache), 2)
+            self.assertIsNotNone(cache.get(hashcache.DIGESTS, names[1]))
+            self.assertIsNone(cache.get(hashcache.DIGESTS, names[0]))
+            with open(names[1], "ab") as f:
+                f.write(b"more")
+            self.assertIsNone(cache.get(hashcache.DIGESTS, names[1]))
+            self.assertEqual(cache.file_digests(names[1]), file_checker.file_digests(names[1]))
+
+            data_hash = cache.merkle_data_hash(names[2], chunk_size=100)
+            self.assertEqual(data_hash, file_checker.merkle_data_hash(names[2], 100))
+            self.assertEqual(cache.get(f"{hashcache.MERKLE}-100", names[2]), data_hash)
+
+            # A file of another shape is an empty cache too
+            with open(cache_file, "wb") as f:
+                pickle.dump([1, 2], f)
+            self.assertEqual(len(hashcache.HashCache(cache_file)), 0)
+
+            manifest = file_checker.hash_tree(tmp_dir, workers=2, cache=hashcache.HashCache())
+            self.assertEqual(manifest, file_checker.hash_tree(tmp_dir, workers=2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import itertools
+import json
+import os
+from pathlib import Path
+
+from propset import TransProps
+from tracing import tracer
+from transettings import TranSettings
+
+def iter_vcs(source):
+    ''' Yield the transfer VCs of a source, one at a time:
+    a directory of *.json files (one VC each), a JSONL file, or an open text
+    stream of JSON lines. Unreadable VCs are traced and skipped. '''
+    if isinstance(source, (str, os.PathLike)):
+        path = Path(source)
+        if path.is_dir():
+            yield from iter_vc_files(path)
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            yield from iter_vc_lines(f, str(path))
+        return
+    yield from iter_vc_lines(source, getattr(source, "name", "stream"))
+
+def iter_vc_files(directory: Path):
+    ''' One VC per *.json file, in the order of the file names '''
+    for path in sorted(directory.glob("*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                yield json.load(f)
+        except (OSError, ValueError) as err:
+            if tracer.enabled:
+                tracer.emit("invalid vc", f"Skipped {path}: {err}", source=str(path))
+
+def iter_vc_lines(stream, name: str):
+    ''' One VC per line '''
+    for lineno, line in enumerate(stream, 1):
+        if line.strip() == "":
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as err:
+            if tracer.enabled:
+                tracer.emit("invalid vc", f"Skipped {name}:{lineno}: {err}", source=name, line=lineno)
+
+def iter_tickets(source):
+    ''' Yield a request (TransProps) for every transfer VC of a source, see iter_vcs() '''
+    for vcobj in iter_vcs(source):
+        ts = TranSettings()
+        try:
+            ts.from_vc(vcobj)
+        except (KeyError, TypeError) as err:
+            if tracer.enabled:
+                tracer.emit("invalid vc", f"Skipped a VC without {err}", field=str(err))
+            continue
+        yield TransProps(ts)
+
+def judge_stream(checker, reqs, batch_size: int = 1000, store=None):
+    ''' Yield (request, Verdict) of a stream of requests. Only batch_size of them
+    are held at once, each batch is judged with one explain_many() call.
+    store: a decisionstore.DecisionStore which keeps every batch '''
+    reqs = iter(reqs)
+    while True:
+        batch = list(itertools.islice(reqs, batch_size))
+        if len(batch) == 0:
+            return
+        book = checker.book
+        verdicts = checker.explain_many(batch)
+        if store is not None:
+            store.record_many(book, batch, verdicts)
+        yield from zip(batch, verdicts)
@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+import unittest
+
+import ingest
+import propset
+import ruleset
+import transettings
+
+def transfer_vc(ts: transettings.TranSettings) -> dict:
+    ' A transfer VC with the fields of a ticket '
+    subject = {key: getattr(ts, name) for name, key in transettings.VC_SUBJECT_FIELDS}
+    return {"issuer": "did:key:x", "expirationDate": ts.expirationTime, "credentialSubject": subject}
+
+class Test_Ingest(unittest.TestCase):
+    def test_sources(self):
+        arr = transettings.TransGenerator(seed=5).generate_settings(30)
+        expected = [ts.to_tuple() for ts in arr]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for i, ts in enumerate(arr):
+                with open(os.path.join(tmp_dir, f"vc{i:03}.json"), "w", encoding="utf-8") as f:
+                    json.dump(transfer_vc(ts), f)
+            with open(os.path.join(tmp_dir, "broken.json"), "w", encoding="utf-8") as f:
+                f.write("{")
+            got = [req.trans_props.to_tuple() for req in ingest.iter_tickets(tmp_dir)]
+            self.assertEqual(got, expected)
+
+            filename = os.path.join(tmp_dir, "vcs.jsonl")
+            with open(filename, "w", encoding="utf-8") as f:
+                for ts in arr:
+                    f.write(json.dumps(transfer_vc(ts)) + "\n")
+                f.write(json.dumps({"credentialSubject": {}}) + "\n")
+            got = [req.trans_props.to_tuple() for req in ingest.iter_tickets(filename)]
+            self.assertEqual(got, expected)
+
+            checker = ruleset.RuleChecker()
+            judged = list(ingest.judge_stream(checker, ingest.iter_tickets(filename), batch_size=7))
+            self.assertEqual([verdict.decision for _, verdict in judged],
+                             checker.judge_many(propset.TransProps(ts) for ts in arr))
+
+if __name__ == '__main__':
+    unittest.main()
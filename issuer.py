@@ -1,20 +1,23 @@
 import asyncio
 import json
 import time
-from datetime import datetime, timedelta, timezone
+from datetime import timedelta
 
 import didkit
 import fileoper
+from transettings import utc_now
 
 class Issuer:
     """Issuer representing an issuer who can manage users."""
 
-    def __init__(self, keyfile):        
+    def __init__(self, keyfile, expiry_index=None):
+        ''' expiry_index: an expiryindex.ExpiryIndex to add the issued user credentials to '''
         with open(keyfile, "r", encoding="utf-8") as f:
             self.key = f.readline()
             f.close()
         self.did = didkit.key_to_did("key", self.key)
         self.allusers = dict()
+        self.expiry_index = expiry_index
 
     def create_users_batch(self, usernum: int):
         for i in range(usernum):
@@ -34,7 +37,7 @@ class Issuer:
     async def sign_a_user(self, username: str, userkey: str, outfile: str):
         user_did = didkit.key_to_did("key", userkey)
         verification_method = await didkit.key_to_verification_method("key", self.key)
-        issuance_date = datetime.now().replace(microsecond=0)
+        issuance_date = utc_now().replace(microsecond=0)
         expiration_date = issuance_date + timedelta(weeks=24)
 
         credential = {
@@ -60,6 +63,8 @@ class Issuer:
         
         # add user
         self.allusers[username] = user_did
+        if self.expiry_index is not None:
+            self.expiry_index.add_credential(credential)
 
         didkit_options = {
             "proofPurpose": "assertionMethod",
@@ -0,0 +1,56 @@
+from collections import deque
+
+class KeywordMatcher:
+    ''' Aho-Corasick automaton over the keywords of several bases.
+    scan() reads a text once and returns the bases whose keywords occur in it. '''
+
+    def __init__(self, bases: dict):
+        ''' bases: name of a basis => its keywords '''
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [frozenset()]
+        for basis, keywords in bases.items():
+            for kw in keywords:
+                self.add_keyword(kw.lower(), basis)
+        self.build_links()
+
+    def add_keyword(self, kw: str, basis: str):
+        state = 0
+        for ch in kw:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(frozenset())
+                self.goto[state][ch] = nxt
+            state = nxt
+        self.out[state] = self.out[state] | {basis}
+
+    def build_links(self):
+        ''' Failure links in breadth-first order, outputs merged along them '''
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                link = self.fail[state]
+                while link and ch not in self.goto[link]:
+                    link = self.fail[link]
+                self.fail[nxt] = self.goto[link].get(ch, 0)
+                self.out[nxt] = self.out[nxt] | self.out[self.fail[nxt]]
+
+    def scan(self, text: str) -> frozenset:
+        ''' Bases with at least one keyword in the text, case in-sensitive '''
+        goto = self.goto
+        fail = self.fail
+        out = self.out
+        found = set()
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        return frozenset(found)
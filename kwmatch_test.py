@@ -0,0 +1,24 @@
+import unittest
+
+import kwmatch
+import rulebook
+
+class Test_KeywordMatcher(unittest.TestCase):
+    def test_scan(self):
+        matcher = kwmatch.KeywordMatcher({"a": ("he", "hers"), "b": ("she",), "c": ("his",), "d": ("xyz",)})
+        self.assertEqual(matcher.scan("USHERS"), frozenset({"a", "b"}))
+        self.assertEqual(matcher.scan("ahishe"), frozenset({"a", "b", "c"}))
+        self.assertEqual(matcher.scan(""), frozenset())
+
+    def test_same_as_find(self):
+        texts = ["Signed SCCs and BCRs", "through a contract", "only transit", "data processing agreement",
+                 "international data transfer agreement", "none", "FTZ emergency"]
+        for text in texts:
+            expected = set()
+            for basis, keywords in rulebook.default_book().reason_bases.items():
+                if any(text.lower().find(kw) != -1 for kw in keywords):
+                    expected.add(basis)
+            self.assertEqual(rulebook.default_book().reason_matcher.scan(text), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
+
+from propset import TransProps
+from rulebook import RuleReloader, load_book
+from ruleset import RuleChecker, Verdict, Decision
+
+# Checker of a worker process, created once by init_worker()
+worker_checker = None
+
+def init_worker(reload_interval: float = 0, cache_dir=None):
+    global worker_checker
+    worker_checker = RuleChecker(book=load_book(cache_dir=cache_dir))
+    if reload_interval > 0:
+        RuleReloader(worker_checker, interval=reload_interval, cache_dir=cache_dir).start()
+
+def judge_chunk(packed: list) -> list:
+    ''' Judge a chunk of packed requests in a worker process '''
+    reqs = [TransProps.unpack(item) for item in packed]
+    return [(v.decision.value, v.rule, v.version) for v in worker_checker.explain_many(reqs)]
+
+class ParallelRuleChecker:
+    ''' Judge a large stream of requests with a pool of processes.
+    Requests are sent to the workers in their packed form (TransProps.pack()).
+    With reload_interval (seconds), every worker reloads rules.json when it
+    changes, see RuleReloader. With a cache_dir (e.g. rulebook.DEFAULT_CACHE_DIR),
+    the book is compiled once here and every worker loads it from the cache. '''
+
+    def __init__(self, workers: int = None, chunk_size: int = 2000, reload_interval: float = 0,
+                 cache_dir=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        if cache_dir is not None:
+            load_book(cache_dir=cache_dir)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                        initargs=(reload_interval, cache_dir))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown()
+
+    def judge_many(self, reqs) -> list:
+        ''' Decisions of all requests, in the input order '''
+        return [verdict.decision for verdict in self.explain_stream(reqs)]
+
+    def explain_many(self, reqs) -> list:
+        ''' Verdicts of all requests, in the input order '''
+        return list(self.explain_stream(reqs))
+
+    def explain_stream(self, reqs):
+        ''' Yield the verdicts in the input order. At most two chunks per worker
+        are in flight, so a long stream is never held in memory at once. '''
+        reqs = iter(reqs)
+        pending = deque()
+        while True:
+            while len(pending) < self.workers * 2:
+                chunk = [req.pack() for req in itertools.islice(reqs, self.chunk_size)]
+                if len(chunk) == 0:
+                    break
+                pending.append(self.pool.submit(judge_chunk, chunk))
+
+            if len(pending) == 0:
+                return
+
+            for value, rule, version in pending.popleft().result():
+                yield Verdict(Decision(value), rule, version)
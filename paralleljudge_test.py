@@ -0,0 +1,28 @@
+from pathlib import Path
+import tempfile
+import unittest
+
+import paralleljudge
+import rulebook
+import ruleset
+from ruleset_test import make_ticket
+
+class Test_ParallelRuleChecker(unittest.TestCase):
+    def test_same_as_serial(self):
+        reqs = [make_ticket(orig, dest, reason)
+                for orig in ["Germany", "China", "Canada", "Mars"]
+                for dest in ["France", "USA", "China"]
+                for reason in ["SCCs", "contract", "none"]]
+        expected = ruleset.RuleChecker().explain_many(reqs)
+        with paralleljudge.ParallelRuleChecker(workers=2, chunk_size=5) as checker:
+            self.assertEqual(checker.explain_many(reqs), expected)
+
+        # Workers load the book compiled by the parent
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with paralleljudge.ParallelRuleChecker(workers=2, chunk_size=5, cache_dir=cache_dir) as checker:
+                self.assertEqual(list(Path(cache_dir).glob("rulebook-*.pickle")),
+                                 [Path(cache_dir) / f"rulebook-{rulebook.default_book().version}.pickle"])
+                self.assertEqual(checker.explain_many(reqs), expected)
+
+if __name__ == '__main__':
+    unittest.main()
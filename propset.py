@@ -34,9 +34,10 @@ def find_org(desc :str) -> OrgType:
     return OrgType.UNKNOWN
 
 class PropSet:
-    pass
+    __slots__ = ()
 
 class UserPropSet(PropSet):
+    __slots__ = ("user_name", "user_org", "org_type", "user_location", "user_citizen")
     user_location: str
     user_citizen: str
 
@@ -58,22 +59,45 @@ class UserPropSet(PropSet):
         self.user_org = org
         self.org_type = orgtype
 
+    def pack(self) -> tuple:
+        ''' Compact form of the user, see from_packed() '''
+        return (self.user_name, self.user_org, self.org_type)
+
+    @classmethod
+    def from_packed(cls, values: tuple) -> 'UserPropSet':
+        prop = cls.__new__(cls)
+        prop.set_user(*values)
+        return prop
+
 class OrgPropSet:
+    __slots__ = ("org_name", "org_desc", "org_type")
     org_name: str
     org_desc: str
     org_type: OrgType
 
+    def pack(self) -> tuple:
+        ''' Compact form of the organization, see from_packed() '''
+        return (self.org_name, self.org_desc, self.org_type.value)
+
+    @classmethod
+    def from_packed(cls, values: tuple) -> 'OrgPropSet':
+        prop = cls()
+        prop.org_name = values[0]
+        prop.org_desc = values[1]
+        prop.org_type = OrgType(values[2])
+        return prop
+
 class SenderPropSet(UserPropSet):
-    pass
+    __slots__ = ()
 
 class ReceiverPropSet(UserPropSet):
-    pass
+    __slots__ = ()
 
 class SenderOrgPropSet(OrgPropSet):
-    pass
+    __slots__ = ()
 
 class ReceiverOrgPropSet(OrgPropSet):
-    pass
+    __slots__ = ()
 
 class TransDataPropSet(TranSettings):
     pass
@@ -85,7 +109,11 @@ class ReceiverConstraints:
     pass
 
 class TransProps:
-    ''' All properties of a transborder request '''
+    ''' All properties of a transborder request.
+    region_codes, region_infos, reason_match, data_match and rule_version are set by the rules,
+    see RuleBook.prepare(). '''
+    __slots__ = ("trans_props", "sender_prop", "receiver_prop", "sender_org", "receiver_org",
+                 "region_codes", "region_infos", "reason_match", "data_match", "rule_version")
     sender_prop: SenderPropSet
     receiver_prop: ReceiverPropSet
     sender_org: OrgPropSet
@@ -109,3 +137,30 @@ class TransProps:
         self.receiver_org.org_name = orgname
         self.receiver_org.org_desc = orgdesc
         self.receiver_org.org_type = find_org(orgdesc)
+
+    def pack(self) -> tuple:
+        ''' Compact form of the request, to be sent to another process '''
+        return (self.trans_props.to_tuple(),
+                pack_prop(self, "sender_prop"),
+                pack_prop(self, "receiver_prop"),
+                pack_prop(self, "sender_org"),
+                pack_prop(self, "receiver_org"))
+
+    @classmethod
+    def unpack(cls, values: tuple) -> 'TransProps':
+        ''' Rebuild a request from pack() '''
+        req = cls(TranSettings.from_tuple(values[0]))
+        if values[1] is not None:
+            req.sender_prop = SenderPropSet.from_packed(values[1])
+        if values[2] is not None:
+            req.receiver_prop = ReceiverPropSet.from_packed(values[2])
+        if values[3] is not None:
+            req.sender_org = SenderOrgPropSet.from_packed(values[3])
+        if values[4] is not None:
+            req.receiver_org = ReceiverOrgPropSet.from_packed(values[4])
+        return req
+
+def pack_prop(req: TransProps, name: str):
+    if hasattr(req, name) is False:
+        return None
+    return getattr(req, name).pack()
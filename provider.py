@@ -1,9 +1,9 @@
 import asyncio
 import json
-from datetime import datetime, timezone
 
 import didkit
 
+import file_checker
 import fileoper
 import transettings
 
@@ -12,21 +12,29 @@ from simplevdr import get_user_id
 class Provider:
     ''' Sign user's transborder VC'''
     
-    def __init__(self, keyfile):
+    def __init__(self, keyfile, hash_cache=None):
+        ''' hash_cache: a hashcache.HashCache of the data files '''
         with open(keyfile, "r", encoding="utf-8") as f:
             self.key = f.readline()
             f.close()
         self.did = didkit.key_to_did("key", self.key)
         self.is_valid = False
+        self.hash_cache = hash_cache
 
-    def create_trans_request(self, receiver: str, approver1: str, outfile: str):
-        ''' create a transfer request json file. outfile: transfer json. '''
+    def create_trans_request(self, receiver: str, approver1: str, outfile: str, datafile: str = None):
+        ''' create a transfer request json file. outfile: transfer json.
+        datafile: the data to transfer, its file_checker.MerkleHash is the dataHash '''
         
         # sender: str, receiver: str, approver1: str
         send_did = get_user_id(receiver)
         receiver_did = self.did
         approv_did = get_user_id(approver1)
         settings = transettings.create_demo_setting(send_did, receiver_did, approv_did)
+        if datafile is not None:
+            if self.hash_cache is not None:
+                settings.dataHash = self.hash_cache.merkle_data_hash(datafile)
+            else:
+                settings.dataHash = file_checker.merkle_data_hash(datafile)
         
         asyncio.run(self.fill_trans_req(settings, outfile))
         print(f'VC File {outfile} generated.')
@@ -34,7 +42,7 @@ class Provider:
     async def fill_trans_req(self, trans: transettings.TranSettings, outfile: str):
         ''' Sign a verification credential. outfile: transfer VC. '''
 
-        issuance_date = datetime.now().replace(microsecond=0)
+        issuance_date = transettings.utc_now().replace(microsecond=0)
 
         credential = {
             "id": "http://example.org/credentials/transborder",
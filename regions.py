@@ -0,0 +1,84 @@
+from enum import Enum
+from functools import lru_cache
+from typing import NamedTuple
+
+class Region(Enum):
+    ''' Different jurisdiction with different laws '''
+    EEA = 1
+    CHINA = 2
+    INDIA = 3
+    RUSSIA = 4
+    SINGAPORE= 5
+    VIETNAM = 6
+    JAPAN = 7
+    KOREA = 8
+    HONGKONG = 9
+    UK = 10
+    USA = 11
+    CANADA = 12
+    MACRO = 14
+    UNKNOWN = 100
+
+# Attributes of an area, see "areas" of rules.json
+EEA = "eea"
+CBPR = "cbpr"                   # Global Cross-Border Privacy Rules
+GDPR_ADEQUACY = "gdpr adequacy" # GDPR Article 45
+UK_ADEQUACY = "uk adequacy"     # UK GDPR, on top of the GDPR ones
+
+class RegionInfo(NamedTuple):
+    ''' An entry of the region index '''
+    code: int
+    name: str
+    region: Region
+    eea: bool
+    cbpr: bool
+    gdpr_adequacy: bool
+    uk_adequacy: bool
+
+UNKNOWN_CODE = 0
+
+class RegionIndex:
+    ''' Normalized area names and aliases => RegionInfo. Every known area has an
+    integer code, which is also its position in infos. Unknown areas get code 0. '''
+
+    def __init__(self, areas: list):
+        ''' areas: [{"names": aliases, "region": name of a Region, "attrs": attributes}] '''
+        self.infos = [RegionInfo(UNKNOWN_CODE, "", Region.UNKNOWN, False, False, False, False)]
+        self.aliases = {}
+        for area in areas:
+            names = area["names"]
+            attrs = area.get("attrs", [])
+            info = RegionInfo(len(self.infos), normalize(names[0]), Region[area["region"]],
+                              EEA in attrs, CBPR in attrs,
+                              GDPR_ADEQUACY in attrs, UK_ADEQUACY in attrs)
+            self.infos.append(info)
+            for name in names:
+                self.aliases[normalize(name)] = info.code
+
+    def code(self, desc: str) -> int:
+        return self.aliases.get(normalize(desc), UNKNOWN_CODE)
+
+    def info(self, desc: str) -> RegionInfo:
+        return self.infos[self.code(desc)]
+
+@lru_cache(maxsize=4096)
+def normalize(desc: str) -> str:
+    ''' " United  Kingdom" ==> "united kingdom" '''
+    return " ".join(desc.lower().split())
+
+def default_index() -> RegionIndex:
+    ''' The region index of the default book, see rulebook.default_book() '''
+    from rulebook import default_book
+    return default_book().index
+
+@lru_cache(maxsize=4096)
+def area_code(desc: str) -> int:
+    ''' Integer code of an area name in the default index, see RegionIndex '''
+    return default_index().code(desc)
+
+def find_info(desc: str) -> RegionInfo:
+    return default_index().infos[area_code(desc)]
+
+def find_region(desc: str) -> Region:
+    ''' Find the matched jurisdiction '''
+    return find_info(desc).region
@@ -0,0 +1,18 @@
+import unittest
+
+import cbpr
+import regions
+import ruleset
+
+class Test_RegionIndex(unittest.TestCase):
+    def test_aliases(self):
+        self.assertEqual(regions.find_region(" The  United Kingdom"), ruleset.Region.UK)
+        self.assertEqual(regions.area_code("UK"), regions.area_code("united kingdom"))
+        self.assertEqual(regions.area_code("Atlantis"), regions.UNKNOWN_CODE)
+        self.assertTrue(regions.find_info("France").eea)
+        self.assertTrue(regions.find_info("Switzerland").gdpr_adequacy)
+        self.assertTrue(cbpr.is_cbpr("republic of korea"))
+        self.assertFalse(cbpr.is_cbpr("China"))
+
+if __name__ == '__main__':
+    unittest.main()
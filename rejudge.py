@@ -0,0 +1,136 @@
+from typing import NamedTuple
+
+from propset import TransProps
+from regions import normalize
+from rulebook import RuleBook
+from ruleset import RuleChecker, Verdict, Decision, RULE_EXPIRED, RULE_NO_RULES
+
+class Dependency(NamedTuple):
+    ''' What the decision of a ticket depends on: its region pair and the
+    bases matched by its reason and dataType '''
+    orig: str
+    dest: str
+    reason_match: frozenset
+    data_match: frozenset
+
+class JudgedTicket:
+    ''' A stored ticket with its verdict '''
+
+    def __init__(self, req: TransProps, verdict: Verdict, dependency: Dependency):
+        self.req = req
+        self.verdict = verdict
+        self.dependency = dependency
+
+class RejudgeReport:
+    ''' Outcome of DecisionLog.rejudge() '''
+
+    def __init__(self, version: str):
+        self.version = version
+        self.checked = 0
+        self.rejudged = 0
+        self.flips = {}
+
+    def add_flip(self, ticket_id: str, old: Decision, new: Decision):
+        self.flips.setdefault((old, new), []).append(ticket_id)
+
+    def summary(self) -> dict:
+        ''' "GO => REJECT" => number of tickets '''
+        return {f"{old.name} => {new.name}": len(ids) for (old, new), ids in self.flips.items()}
+
+class DecisionLog:
+    ''' Judged tickets, with what their decisions depend on. When the rules
+    change, rejudge() judges again only the tickets which a changed rule,
+    area or legal basis can affect. '''
+
+    def __init__(self):
+        self.entries = []
+        # Version => book of the stored verdicts
+        self.books = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def judge_many(self, checker: RuleChecker, reqs) -> list:
+        ''' Judge and store requests. Returns the verdicts. '''
+        reqs = list(reqs)
+        book = checker.book
+        verdicts = checker.explain_many(reqs)
+        # The rules may have been swapped meanwhile, see RuleReloader
+        for bk in (book, checker.book):
+            self.books.setdefault(bk.version, bk)
+        for req, verdict in zip(reqs, verdicts):
+            self.record(req, verdict)
+        return verdicts
+
+    def record(self, req: TransProps, verdict: Verdict):
+        ''' Store a request judged by a book (see RuleBook.prepare()) '''
+        ts = req.trans_props
+        dependency = Dependency(normalize(ts.origArea), normalize(ts.destArea),
+                                req.reason_match, req.data_match)
+        self.entries.append(JudgedTicket(req, verdict, dependency))
+
+    def rejudge(self, checker: RuleChecker) -> RejudgeReport:
+        ''' Bring all verdicts to the book of the checker. Tickets unaffected by
+        the changes keep their decisions, the others are judged again and the
+        flipped decisions are reported. Expiration is not checked again. '''
+        book = checker.book
+        self.books.setdefault(book.version, book)
+        report = RejudgeReport(book.version)
+        affected = {}
+        for entry in self.entries:
+            verdict = entry.verdict
+            if verdict.version == book.version or verdict.rule == RULE_EXPIRED:
+                continue
+            report.checked += 1
+
+            key = (verdict.version, entry.dependency)
+            changed = affected.get(key)
+            if changed is None:
+                changed = is_affected(self.books.get(verdict.version), book, entry.dependency)
+                affected[key] = changed
+            if changed is False:
+                changed = bases_changed(self.books[verdict.version], book, entry)
+            if changed is False:
+                entry.verdict = verdict._replace(version=book.version)
+                continue
+
+            new_verdict = decide(book, entry.req)
+            report.rejudged += 1
+            if new_verdict.decision != verdict.decision:
+                report.add_flip(entry.req.trans_props.ticketId, verdict.decision, new_verdict.decision)
+            entry.verdict = new_verdict
+            entry.dependency = entry.dependency._replace(reason_match=entry.req.reason_match,
+                                                         data_match=entry.req.data_match)
+        return report
+
+def is_affected(old: RuleBook, new: RuleBook, dep: Dependency) -> bool:
+    ''' Whether the rules or the areas of a region pair differ between two books.
+    Without the old book, every ticket is affected. '''
+    if old is None or old.code_version != new.code_version:
+        return True
+    old_orig = old.index.info(dep.orig)
+    new_orig = new.index.info(dep.orig)
+    # Every field but the code, which is only a position in the index
+    if old_orig[1:] != new_orig[1:]:
+        return True
+    if old.index.info(dep.dest)[1:] != new.index.info(dep.dest)[1:]:
+        return True
+    region_name = new_orig.region.name
+    return old.jurisdictions.get(region_name) != new.jurisdictions.get(region_name)
+
+def bases_changed(old: RuleBook, new: RuleBook, entry: JudgedTicket) -> bool:
+    ''' Whether the reason or dataType of a ticket match other bases in the new book '''
+    if old.reason_bases == new.reason_bases and old.data_bases == new.data_bases:
+        return False
+    ts = entry.req.trans_props
+    return (new.reason_matcher.scan(ts.reason) != entry.dependency.reason_match
+            or new.data_matcher.scan(ts.dataType) != entry.dependency.data_match)
+
+def decide(book: RuleBook, req: TransProps) -> Verdict:
+    ''' Judge a request with the rules of a book, as RuleChecker does but without
+    the expiration check '''
+    book.prepare(req)
+    rules = book.rule_sets.get(book.index.infos[req.region_codes[0]].region)
+    if rules is None:
+        return Verdict(Decision.TBD, RULE_NO_RULES, book.version)
+    return rules.decide(req)
@@ -0,0 +1,43 @@
+import json
+from pathlib import Path
+import tempfile
+import unittest
+
+import rejudge
+import rulebook
+import ruleset
+from ruleset_test import make_ticket
+
+class Test_DecisionLog(unittest.TestCase):
+    def test_rejudge(self):
+        defs = json.loads(rulebook.DEFAULT_RULES.read_text(encoding="utf-8"))
+        reqs = [make_ticket(orig, dest, reason)
+                for orig in ["Germany", "India", "Canada"]
+                for dest in ["Japan", "China", "Israel"]
+                for reason in ["local storage", "none"]]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "rules.json"
+            path.write_text(json.dumps(defs), encoding="utf-8")
+            checker = ruleset.RuleChecker(book=rulebook.load_book(path, cache_dir=None))
+            log = rejudge.DecisionLog()
+            log.judge_many(checker, reqs)
+
+            # India blacklists Japan, and Israel is no longer adequate for GDPR
+            defs["jurisdictions"]["INDIA"]["deny"].append({"rule": "RuleInBlacklist", "blacklist": ["Japan"]})
+            for area in defs["areas"]:
+                if area["names"][0] == "israel":
+                    area["attrs"].remove("gdpr adequacy")
+            path.write_text(json.dumps(defs), encoding="utf-8")
+            checker.load_book(rulebook.load_book(path, cache_dir=None))
+
+            report = log.rejudge(checker)
+            self.assertEqual(report.checked, len(reqs))
+            # India => any, any => Israel
+            self.assertEqual(report.rejudged, 6 + 4)
+            self.assertEqual(report.summary(), {"GO => TBD": 2, "GO => REJECT": 1, "TBD => REJECT": 1})
+            self.assertEqual([entry.verdict for entry in log.entries],
+                             ruleset.RuleChecker(book=checker.book).explain_many(reqs))
+            self.assertEqual(log.rejudge(checker).checked, 0)
+
+if __name__ == '__main__':
+    unittest.main()
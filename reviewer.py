@@ -1,24 +1,27 @@
 import asyncio
 import json
-from datetime import datetime, timedelta, timezone
+from datetime import timedelta
 
 import didkit
 
 import fileoper
-from ruleset import RuleChecker
+import ingest
+from ruleset import shared_checker
 from ruleset import Decision
-from transettings import TranSettings
+from transettings import TranSettings, utc_now
 from propset import TransProps
 
 class Reviewer:
     ''' Sign user's transborder VC'''
     
-    def __init__(self, keyfile):
+    def __init__(self, keyfile, store=None):
+        ''' store: a decisionstore.DecisionStore to keep the decisions in '''
         with open(keyfile, "r", encoding="utf-8") as f:
             self.key = f.readline()
             f.close()
         self.did = didkit.key_to_did("key", self.key)
         self.is_valid = False
+        self.store = store
 
     def check_rules(self, filename: str) -> Decision:
         ''' TODO check transborder rules '''
@@ -27,13 +30,22 @@ class Reviewer:
             f.close()
         
         print(f'''{jo["issuer"]}''')
-        rc = RuleChecker()
+        rc = shared_checker()
         ticket = TranSettings()
         ticket.from_vc(jo)
         tps = TransProps(ticket)
 
+        if self.store is not None:
+            return self.store.judge_many(rc, [tps])[0].decision
         return rc.judge(tps)
 
+    def check_all(self, source):
+        ''' Yield (ticketId, Decision) of all transfer VCs of a directory or a
+        JSONL file, see ingest.iter_vcs() '''
+        for req, verdict in ingest.judge_stream(shared_checker(), ingest.iter_tickets(source),
+                                                store=self.store):
+            yield req.trans_props.ticketId, verdict.decision
+
     def sign_file(self, filename: str, outfile: str):
         ''' Sign user's transborder VC'''
         with open(filename, "r", encoding="utf-8") as f:
@@ -65,7 +77,7 @@ class Reviewer:
             f.close()
 
         verification_method = await didkit.key_to_verification_method("key", self.key)
-        issuance_date = datetime.now().replace(microsecond=0)
+        issuance_date = utc_now().replace(microsecond=0)
         expiration_date = issuance_date + timedelta(weeks=2)
 
         # didkit-python-main\tests\test_main.py
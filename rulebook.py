@@ -0,0 +1,232 @@
+from functools import lru_cache
+import hashlib
+import json
+import os
+from pathlib import Path
+import pickle
+import tempfile
+import threading
+
+from propset import TransProps
+from kwmatch import KeywordMatcher
+from regions import Region, RegionIndex, normalize
+from ruleset import Decision, Rule, Rules, RuleChecker, rule_kinds
+from tracing import tracer
+
+# Areas, legal bases and the rules of every jurisdiction
+DEFAULT_RULES = Path(__file__).with_name("rules.json")
+
+# Where to cache compiled books, when asked to. Per user, never a shared directory
+# like /tmp: a pickle runs code when it is loaded.
+DEFAULT_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "trans-border"
+# Environment variable naming the cache directory of default_book(), none if unset
+CACHE_DIR_ENV = "TRANS_BORDER_RULE_CACHE"
+
+# Modules whose code is pickled into a book, a change of them invalidates the cache
+SOURCES = ("ruleset.py", "regions.py", "kwmatch.py", "rulebook.py")
+
+# Parameters of a rule in the definitions => conversion of their values
+RULE_PARAMS = {
+    "bases": tuple,
+    "kinds": tuple,
+    "miss": lambda val: Decision[val],
+    "concern_regions": lambda val: tuple(Region[name] for name in val),
+    "blacklist": lambda val: tuple(normalize(name) for name in val),
+}
+
+class RuleBook:
+    ''' Rules of every jurisdiction compiled from definitions (see rules.json),
+    with the areas and legal bases they were compiled against.
+    A book is never changed once compiled. version identifies its content. '''
+
+    def __init__(self, defs: dict, version: str):
+        self.version = version
+        self.code_version = code_version()
+        self.jurisdictions = defs["jurisdictions"]
+        self.index = RegionIndex(defs["areas"])
+        self.reason_bases = defs["reasonBases"]
+        self.data_bases = defs["dataBases"]
+        self.reason_matcher = KeywordMatcher(self.reason_bases)
+        self.data_matcher = KeywordMatcher(self.data_bases)
+
+        kinds = rule_kinds()
+        self.rule_sets = {}
+        for region_name, lists in defs["jurisdictions"].items():
+            rules = Rules(Region[region_name])
+            for entry in lists.get("deny", []):
+                rules.add_deny(self.make_rule(kinds, entry))
+            for entry in lists.get("allow", []):
+                rules.add_allow(self.make_rule(kinds, entry))
+            for entry in lists.get("risk", []):
+                rules.add_risk(self.make_rule(kinds, entry))
+            self.rule_sets[rules.region] = rules.compile(self.index, version)
+
+    def make_rule(self, kinds: dict, entry) -> Rule:
+        ''' entry: name of a rule class, or {"rule": name, parameter: value} '''
+        if isinstance(entry, str):
+            entry = {"rule": entry}
+        rule_cls = kinds.get(entry["rule"])
+        if rule_cls is None:
+            raise ValueError(f"Unknown rule: {entry['rule']}")
+        rl = rule_cls()
+        for name, val in entry.items():
+            if name == "rule":
+                continue
+            convert = RULE_PARAMS.get(name)
+            if convert is None:
+                raise ValueError(f"Unknown parameter of {entry['rule']}: {name}")
+            setattr(rl, name, convert(val))
+        for basis in getattr(rl, "bases", ()):
+            if basis not in self.reason_bases:
+                raise ValueError(f"Unknown legal basis of {entry['rule']}: {basis}")
+        return rl
+
+    def prepare(self, req: TransProps):
+        ''' Resolve the areas and scan the texts of a ticket against this book.
+        Done once per ticket and book. '''
+        if getattr(req, "rule_version", None) == self.version:
+            return
+        ts = req.trans_props
+        orig_code, dest_code = self.index.code(ts.origArea), self.index.code(ts.destArea)
+        req.region_codes = (orig_code, dest_code)
+        req.region_infos = (self.index.infos[orig_code], self.index.infos[dest_code])
+        req.reason_match = cached_scan(self.reason_matcher, ts.reason)
+        req.data_match = cached_scan(self.data_matcher, ts.dataType)
+        req.rule_version = self.version
+
+# Bound of the remembered scans, of all matchers
+SCAN_CACHE_SIZE = 8192
+
+@lru_cache(maxsize=SCAN_CACHE_SIZE)
+def cached_scan(matcher: KeywordMatcher, text: str) -> frozenset:
+    ''' matcher.scan(text), remembered outside of the book: texts of tickets repeat a lot '''
+    return matcher.scan(text)
+
+def book_version(content: bytes) -> str:
+    ''' Hash of the definitions and of the code compiling them '''
+    digest = hashlib.sha256(content)
+    digest.update(code_version().encode())
+    return digest.hexdigest()[:16]
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    ''' Hash of the code of the rules, as loaded by this process '''
+    digest = hashlib.sha256()
+    here = Path(__file__).parent
+    for name in SOURCES:
+        digest.update((here / name).read_bytes())
+    return digest.hexdigest()[:16]
+
+def load_book(path=DEFAULT_RULES, cache_dir=None) -> RuleBook:
+    ''' The compiled book of a definitions file. With a cache_dir (e.g.
+    DEFAULT_CACHE_DIR), from the cache if it was compiled before. '''
+    content = Path(path).read_bytes()
+    version = book_version(content)
+    if cache_dir is None:
+        return RuleBook(json.loads(content), version)
+
+    cache_file = Path(cache_dir) / f"rulebook-{version}.pickle"
+    try:
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+
+    book = RuleBook(json.loads(content), version)
+    save_book(book, cache_file)
+    return book
+
+def save_book(book: RuleBook, cache_file: Path):
+    ''' Written to a temporary file and renamed, so readers never see a partial one.
+    The cache is an optimization: failures are ignored. '''
+    try:
+        cache_file.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=cache_file.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(book, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_name, cache_file)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+    except OSError:
+        pass
+
+default_lock = threading.Lock()
+default = None
+
+def default_book() -> RuleBook:
+    ''' The book of rules.json, loaded once per process. From the cache directory
+    of $TRANS_BORDER_RULE_CACHE if it is set. '''
+    global default
+    if default is None:
+        with default_lock:
+            if default is None:
+                default = load_book(cache_dir=os.environ.get(CACHE_DIR_ENV) or None)
+    return default
+
+class RuleReloader:
+    ''' Watch a definitions file and swap a new book into a checker when it changes.
+    The book is compiled in a background thread while the checker keeps judging
+    with the old one, then swapped in with RuleChecker.load_book(). Definitions
+    which do not compile are reported and the old book is kept. '''
+
+    def __init__(self, checker: RuleChecker, path=DEFAULT_RULES, interval: float = 5.0,
+                 cache_dir=None):
+        self.checker = checker
+        self.path = Path(path)
+        self.interval = interval
+        self.cache_dir = cache_dir
+        self.stamp = self.file_stamp()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="rule-reloader", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while self.stopped.wait(self.interval) is False:
+            self.check()
+
+    def file_stamp(self):
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def check(self) -> bool:
+        ''' Reload the book if the file was changed. True if a new book is in use. '''
+        stamp = self.file_stamp()
+        if stamp is None or stamp == self.stamp:
+            return False
+        self.stamp = stamp
+        try:
+            book = load_book(self.path, self.cache_dir)
+        except Exception as err:
+            # Whatever is wrong with the definitions, the reloader keeps running
+            if tracer.enabled:
+                tracer.emit("reload", f"Rules of {self.path} are not loaded: {err}", path=str(self.path))
+            return False
+        old_version = self.checker.book.version
+        if book.version == old_version:
+            return False
+        self.checker.load_book(book)
+        if tracer.enabled:
+            tracer.emit("reload", f"Rules {old_version} => {book.version}",
+                        path=str(self.path), old=old_version, version=book.version)
+        return True
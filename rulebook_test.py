@@ -0,0 +1,78 @@
+import json
+from pathlib import Path
+import tempfile
+import unittest
+
+import rulebook
+import ruleset
+import tracing
+from ruleset_test import make_ticket
+
+class Test_RuleBook(unittest.TestCase):
+    def test_disk_cache(self):
+        reqs = [make_ticket("Germany", "China", "SCCs"), make_ticket("India", "Japan", "x", "payment")]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            book = rulebook.load_book(cache_dir=cache_dir)
+            cache_file = Path(cache_dir) / f"rulebook-{book.version}.pickle"
+            self.assertTrue(cache_file.exists())
+
+            cached = rulebook.load_book(cache_dir=cache_dir)
+            self.assertIsNot(cached, book)
+            self.assertEqual(cached.version, book.version)
+            self.assertEqual(ruleset.RuleChecker(book=cached).judge_many(reqs),
+                             ruleset.RuleChecker(book=book).judge_many(reqs))
+
+    def test_definitions(self):
+        defs = json.loads(rulebook.DEFAULT_RULES.read_text(encoding="utf-8"))
+        defs["jurisdictions"]["INDIA"]["deny"].append({"rule": "RuleInBlacklist", "blacklist": ["Japan"]})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "rules.json"
+            path.write_text(json.dumps(defs), encoding="utf-8")
+            book = rulebook.load_book(path, cache_dir=None)
+            self.assertNotEqual(book.version, rulebook.default_book().version)
+            checker = ruleset.RuleChecker(book=book)
+            self.assertEqual(checker.judge(make_ticket("India", "Japan", "local storage")), ruleset.Decision.REJECT)
+            self.assertEqual(checker.judge(make_ticket("India", "France", "local storage")), ruleset.Decision.GO)
+
+            defs["jurisdictions"]["INDIA"]["deny"].append("RuleNobody")
+            path.write_text(json.dumps(defs), encoding="utf-8")
+            with self.assertRaises(ValueError):
+                rulebook.load_book(path, cache_dir=None)
+
+    def test_reload(self):
+        defs = json.loads(rulebook.DEFAULT_RULES.read_text(encoding="utf-8"))
+        req = make_ticket("India", "Japan", "local storage")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "rules.json"
+            path.write_text(json.dumps(defs), encoding="utf-8")
+            checker = ruleset.RuleChecker(cache_size=16, book=rulebook.load_book(path, cache_dir=None))
+            reloader = rulebook.RuleReloader(checker, path, cache_dir=None)
+            old = checker.explain(req)
+            self.assertEqual(old.decision, ruleset.Decision.GO)
+            self.assertEqual(old.version, checker.book.version)
+            self.assertFalse(reloader.check())
+
+            defs["jurisdictions"]["INDIA"]["deny"].append({"rule": "RuleInBlacklist", "blacklist": ["Japan"]})
+            path.write_text(json.dumps(defs), encoding="utf-8")
+            self.assertTrue(reloader.check())
+            new = checker.explain(req)
+            self.assertEqual(new.decision, ruleset.Decision.REJECT)
+            self.assertNotEqual(new.version, old.version)
+
+            # Broken definitions keep the rules in use
+            path.write_text("{", encoding="utf-8")
+            self.assertFalse(reloader.check())
+            self.assertEqual(checker.explain(req), new)
+            defs["jurisdictions"]["INDIA"]["deny"] = 5
+            path.write_text(json.dumps(defs), encoding="utf-8")
+            sink = tracing.MemorySink()
+            tracing.tracer.enable(sink)
+            try:
+                self.assertFalse(reloader.check())
+            finally:
+                tracing.tracer.disable()
+            self.assertEqual([record["event"] for record in sink.records], ["reload"])
+            self.assertEqual(checker.explain(req), new)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,74 +1,13 @@
 
 from enum import Enum
-from propset import TransProps, OrgType
-from cbpr import is_cbpr
-
-class Region(Enum):
-    ''' Different jurisdiction with different laws '''
-    EEA = 1
-    CHINA = 2
-    INDIA = 3
-    RUSSIA = 4
-    SINGAPORE= 5
-    VIETNAM = 6
-    JAPAN = 7
-    KOREA = 8
-    HONGKONG = 9
-    UK = 10
-    USA = 11
-    CANADA = 12
-    MACRO = 14
-    UNKNOWN = 100
-
-def find_region(desc :str) -> Region:
-    ''' Find the matched jurisdiction '''
-    descl = str.lower(desc)
-    res = Region.UNKNOWN
-    match descl:
-        case "austria" | "belgium" | "bulgaria" | "croatia" | "republic of cyprus":
-            res =  Region.EEA
-        case "czech republic" | "denmark" | "estonia" | "finland":
-            res =  Region.EEA
-        case "france" | "germany" | "greece" | "hungary" | "ireland":
-            res =  Region.EEA
-        case "italy" | "latvia" | "lithuania" | "luxembourg" | "malta":
-            res =  Region.EEA
-        case "netherlands" | "poland" | "portugal" | "romania" | "slovakia":
-            res =  Region.EEA
-        case "slovenia" | "spain" | "sweden":
-            res =  Region.EEA
-        case "iceland" | "liechtenstein" | "norway":
-            # Not in EU, but in EEA
-            res =  Region.EEA
-        case "china":
-            res =  Region.CHINA
-        case "india":
-            res =  Region.INDIA
-        case "russia":
-            res =  Region.RUSSIA
-        case "singapore":
-            res =  Region.SINGAPORE
-        case "vietnam":
-            res =  Region.VIETNAM
-        case "japan":
-            res =  Region.JAPAN
-        case "canada":
-            res =  Region.CANADA
-        case "united kingdom" | "uk" | "the united kingdom":
-            res =  Region.UK
-        case "the united states" | "united states" | "usa":
-            res =  Region.USA
-        case "korea" | "republic of korea":
-            res =  Region.KOREA
-        case "hongkong" | "hong kong":
-            res =  Region.HONGKONG
-        case "macro" | "aomen":
-            res =  Region.MACRO
-        case _:
-            res = Region.UNKNOWN
-        
-    #print(f"DBG: Region: {desc}, result: {res}")
-    return res
+import threading
+import time
+from types import MappingProxyType
+from typing import NamedTuple
+from propset import TransProps, OrgType, find_org
+from decisioncache import DecisionCache
+from tracing import tracer
+from regions import Region, RegionInfo, RegionIndex, default_index, find_region, normalize
 
 class Decision(Enum):
     ''' Decision on trasfer request '''
@@ -78,10 +17,82 @@ class Decision(Enum):
     TBD = 4
     UNKNOWN = 100
 
+def prepared(req: TransProps) -> TransProps:
+    ''' The request, prepared against the default book unless a book already did,
+    see RuleBook.prepare() '''
+    if getattr(req, "rule_version", None) is None:
+        from rulebook import default_book
+        default_book().prepare(req)
+    return req
+
+def region_codes(req: TransProps) -> tuple:
+    ' Codes of the origin and the destination, resolved once per ticket '
+    return prepared(req).region_codes
+
+def region_infos(req: TransProps) -> tuple:
+    ' RegionInfo of the origin and the destination, resolved once per ticket '
+    return prepared(req).region_infos
+
+def reason_bases(req: TransProps) -> frozenset:
+    ' Legal bases claimed by the reason, scanned once per ticket '
+    return prepared(req).reason_match
+
+def data_bases(req: TransProps) -> frozenset:
+    ' Kinds of the data, scanned once per ticket '
+    return prepared(req).data_match
+
+# Decisions a rule may return, for rules which do not declare theirs
+ANY_DECISION = frozenset(Decision)
+GO_OR_TBD = frozenset((Decision.GO, Decision.TBD))
+
 class Rule:
+    # Decisions which check() may return, see rulestats.same_decisions()
+    outcomes = ANY_DECISION
+
     def check(self, req: TransProps) -> Decision:
         return Decision.TBD
 
+    def check_ticket(self, req: TransProps) -> Decision:
+        ' The part of check() which needs the whole ticket '
+        return self.check(req)
+
+class PairRule(Rule):
+    ''' A rule which mostly depends on the origin and the destination only.
+    Its outcome for a region pair is computed once, see Rules.pair_outcomes() '''
+
+    def check_pair(self, orig: Region, dest: RegionInfo) -> Decision:
+        ''' Outcome for the pair, None if check_ticket() has to decide '''
+        return Decision.TBD
+
+    def check(self, req: TransProps) -> Decision:
+        orig, dest = region_infos(req)
+        res = self.check_pair(orig.region, dest)
+        if res is None:
+            return self.check_ticket(req)
+        return res
+
+    def check_ticket(self, req: TransProps) -> Decision:
+        return Decision.TBD
+
+class ReasonRule(Rule):
+    ''' GO if the reason matches one of the legal bases, otherwise "miss" '''
+    bases = ()
+    miss = Decision.TBD
+
+    @property
+    def outcomes(self) -> frozenset:
+        return frozenset((Decision.GO, self.miss))
+
+    def check(self, req: TransProps) -> Decision:
+        matched = reason_bases(req)
+        for basis in self.bases:
+            if basis in matched:
+                if tracer.enabled:
+                    tracer.emit("rule", f"Ticket has valid {basis}: {req.trans_props.ticketId}",
+                                ticket=req.trans_props.ticketId, rule=rule_name(self), basis=basis)
+                return Decision.GO
+        return self.miss
+
 class AllowRule(Rule):
     ' If matches then allow '
 
@@ -92,174 +103,390 @@ class RiskRule(Rule):
     ' Not forbidded by law, but with concerns '
 
 class Rules:
-    allow_rules = []
-    deny_rules = []
-    risk_rules = []
+    ''' Rules of a jurisdiction. Call compile() once all rules are added.
+    The rules of every jurisdiction are defined in rules.json, see rulebook.py '''
+
+    def __init__(self, region: Region):
+        self.region = region
+        self.allow_rules = []
+        self.deny_rules = []
+        self.risk_rules = []
+        self.compiled = False
+        self.pair_table = ()
+        self.version = ""
 
     def add_allow(self, rl: Rule):
+        self.check_editable()
         self.allow_rules.append(rl)
 
     def add_deny(self, rl: Rule):
+        self.check_editable()
         self.deny_rules.append(rl)
 
     def add_risk(self, rl: Rule):
+        self.check_editable()
         self.risk_rules.append(rl)
 
+    def check_editable(self):
+        if getattr(self, "compiled", False):
+            raise RuntimeError(f"{type(self).__name__} is compiled and cannot be changed")
+
+    def __setattr__(self, name, val):
+        self.check_editable()
+        super().__setattr__(name, val)
+
+    def compile(self, index: RegionIndex = None, version: str = "") -> 'Rules':
+        ''' Freeze the rules, so that one instance can be reused for every ticket,
+        from any number of threads. version is recorded in every Verdict.
+        index: the one of the default book if None '''
+        if index is None:
+            index = default_index()
+        self.version = version
+        self.allow_rules = tuple(self.allow_rules)
+        self.deny_rules = tuple(self.deny_rules)
+        self.risk_rules = tuple(self.risk_rules)
+
+        # One row for each area of the region index
+        self.pair_table = tuple(self.build_pair_row(info) for info in index.infos)
+        self.compiled = True
+        return self
+
+    def build_pair_row(self, dest: RegionInfo) -> tuple:
+        ''' Outcomes of the pair rules for a destination, None for other rules '''
+        row = []
+        for rules in (self.deny_rules, self.allow_rules, self.risk_rules):
+            outcomes = []
+            for rl in rules:
+                res = None
+                if isinstance(rl, PairRule):
+                    res = rl.check_pair(self.region, dest)
+                outcomes.append(res)
+            row.append(tuple(outcomes))
+        return tuple(row)
+
+    def pair_outcomes(self, dest_code: int) -> tuple:
+        ''' Outcomes of the deny, allow and risk rules which only depend on the
+        region pair, looked up from the table built by compile() '''
+        if self.compiled:
+            return self.pair_table[dest_code]
+        return self.build_pair_row(default_index().infos[dest_code])
+
     def judge(self, req: TransProps) -> Decision:
         ' Give a decision based on rules '
-        for rl in self.deny_rules:
-            res = rl.check(req)
+        return self.decide(req).decision
+
+    def decide(self, req: TransProps) -> 'Verdict':
+        ' Give a decision based on rules, together with the rule which made it '
+        dest_code = region_codes(req)[1]
+        deny_pairs, allow_pairs, risk_pairs = self.pair_outcomes(dest_code)
+
+        for rl, res in zip(self.deny_rules, deny_pairs):
+            if res is None:
+                res = rl.check_ticket(req)
             if res == Decision.REJECT:
-                return Decision.REJECT
+                return Verdict(Decision.REJECT, rule_name(rl), self.version)
 
-        for rl in self.allow_rules:
-            res = rl.check(req)
+        for rl, res in zip(self.allow_rules, allow_pairs):
+            if res is None:
+                res = rl.check_ticket(req)
             if res == Decision.GO:
-                return Decision.GO
+                return Verdict(Decision.GO, rule_name(rl), self.version)
             if res == Decision.REJECT:
-                print(f"Fobidden in an allow rule: {req.trans_props}")
-                return Decision.REJECT
-
-        for rl in self.risk_rules:
-            res = rl.check(req)
+                if tracer.enabled:
+                    tracer.emit("rule", f"Fobidden in an allow rule: {req.trans_props.ticketId}",
+                                ticket=req.trans_props.ticketId, rule=rule_name(rl))
+                return Verdict(Decision.REJECT, rule_name(rl), self.version)
+
+        for rl, res in zip(self.risk_rules, risk_pairs):
+            if res is None:
+                res = rl.check_ticket(req)
             if res == Decision.RISK:
-                return Decision.RISK
+                return Verdict(Decision.RISK, rule_name(rl), self.version)
             if res == Decision.REJECT:
-                print(f"Fobidden in a risk rule: {req.trans_props}")
-                return Decision.REJECT
+                if tracer.enabled:
+                    tracer.emit("rule", f"Fobidden in a risk rule: {req.trans_props.ticketId}",
+                                ticket=req.trans_props.ticketId, rule=rule_name(rl))
+                return Verdict(Decision.REJECT, rule_name(rl), self.version)
             if res == Decision.GO:
-                print(f"Allowed in a risk rule: {req.trans_props}")
-                return Decision.GO
-
-        print(f"Ticket {req.trans_props.ticketId} cannot be decided automatically!")
-        return Decision.TBD
+                if tracer.enabled:
+                    tracer.emit("rule", f"Allowed in a risk rule: {req.trans_props.ticketId}",
+                                ticket=req.trans_props.ticketId, rule=rule_name(rl))
+                return Verdict(Decision.GO, rule_name(rl), self.version)
+
+        if tracer.enabled:
+            tracer.emit("rule", f"Ticket {req.trans_props.ticketId} cannot be decided automatically!",
+                        ticket=req.trans_props.ticketId)
+        return Verdict(Decision.TBD, RULE_UNDECIDED, self.version)
+
+    def decide_counted(self, req: TransProps, stats) -> 'Verdict':
+        ''' Same verdict as decide(), but the runs, decisions and time of every rule
+        are counted in stats (a rulestats.RuleStats). Slower, and without rule traces. '''
+        dest_code = region_codes(req)[1]
+        phases = zip((self.deny_rules, self.allow_rules, self.risk_rules),
+                     self.pair_outcomes(dest_code), PHASE_DECISIONS)
+        for rules, pairs, decisive in phases:
+            for rl, res in zip(rules, pairs):
+                start = time.perf_counter_ns()
+                if res is None:
+                    res = rl.check_ticket(req)
+                hit = res in decisive
+                stats.record(self.region, rl, hit, time.perf_counter_ns() - start)
+                if hit:
+                    return Verdict(res, rule_name(rl), self.version)
+        return Verdict(Decision.TBD, RULE_UNDECIDED, self.version)
+
+    def with_allow_order(self, allow_rules: tuple) -> 'Rules':
+        ''' A compiled copy which runs the allow rules in another order.
+        The caller checks that the order gives the same decisions. '''
+        positions = {id(rl): i for i, rl in enumerate(self.allow_rules)}
+        order = [positions[id(rl)] for rl in allow_rules]
+        if sorted(order) != list(range(len(self.allow_rules))):
+            raise ValueError("Not an order of the allow rules")
+
+        rules = Rules(self.region)
+        rules.deny_rules = self.deny_rules
+        rules.allow_rules = tuple(allow_rules)
+        rules.risk_rules = self.risk_rules
+        rules.pair_table = tuple((deny, tuple(allow[i] for i in order), risk)
+                                 for deny, allow, risk in self.pair_table)
+        rules.version = self.version
+        rules.compiled = True
+        return rules
+
+# Decisions which end the deny, allow and risk rules
+PHASE_DECISIONS = (
+    frozenset((Decision.REJECT,)),
+    frozenset((Decision.GO, Decision.REJECT)),
+    frozenset((Decision.RISK, Decision.REJECT, Decision.GO)),
+)
+
+class Verdict(NamedTuple):
+    ''' A decision, the name of the rule which made it and the version of the
+    rules (RuleBook.version) '''
+    decision: Decision
+    rule: str
+    version: str = ""
+
+RULE_EXPIRED = "expired"
+RULE_NO_RULES = "no rules"
+RULE_UNDECIDED = "undecided"
+
+def rule_name(rl: Rule) -> str:
+    return type(rl).__name__
 
 class RuleChecker:
-    ''' Check a transborder request and give a decision '''
+    ''' Check a transborder request and give a decision.
+
+    A RuleChecker is thread-safe: its compiled rules (a RuleBook) are immutable,
+    so one warm instance (see shared_checker()) can serve any number of threads
+    without locking. Only the optional decision cache takes a short lock.
+    load_book() swaps the rules atomically: a ticket, or a batch of
+    explain_many(), is judged entirely with the old or the new ones. '''
+
+    def __init__(self, cache_size: int = 0, book=None, stats=None):
+        ''' cache_size: capacity of the decision cache, 0 means no cache.
+        book: compiled rules, the ones of rules.json if not given.
+        stats: a rulestats.RuleStats to count every rule in, the decision cache
+        is not used while counting. '''
+        self.cache = None
+        if cache_size > 0:
+            self.cache = DecisionCache(cache_size)
+        self.stats = stats
+
+        if book is None:
+            from rulebook import default_book
+            book = default_book()
+        self.load_book(book)
+
+    def load_book(self, book):
+        ''' Use other compiled rules. Cached decisions are dropped. '''
+        for rules in book.rule_sets.values():
+            if rules.compiled is False:
+                raise ValueError(f"{type(rules).__name__} is not compiled")
+        # Replaced as a whole, never changed in place
+        self.book = book
+        if self.cache is not None:
+            self.cache.clear()
+
+    @property
+    def rule_sets(self):
+        ''' Region => compiled Rules '''
+        return MappingProxyType(self.book.rule_sets)
 
     def judge(self, req: TransProps) -> Decision:
         ''' Check a transborder request and give a decision. True means allow. '''
-        if req.trans_props.check_expiration() is False:
-            return Decision.REJECT
-
-        req.trans_props.print_info()
-        des = Decision.TBD
-
-        orig_region = find_region(req.trans_props.origArea)
-        match orig_region:
-            case Region.EEA:
-                gdpr = GdprRules()
-                des =  gdpr.judge(req)
-            case Region.UK:
-                gdpr = UkGdprRules()
-                des =  gdpr.judge(req)
-            case Region.CANADA:
-                rl = CanadaRules()
-                des =  rl.judge(req)
-            case Region.USA:
-                rl = UsaRules()
-                des =  rl.judge(req)
-            case Region.VIETNAM:
-                rl = VietnamRules()
-                des =  rl.judge(req)
-            case Region.INDIA:
-                rl = IndianRules()
-                des =  rl.judge(req)
-            case Region.CHINA:
-                rl = ChinaRules()
-                des =  rl.judge(req)
-            case Region.JAPAN:
-                rl = JapanRules()
-                des =  rl.judge(req)
-            case Region.SINGAPORE:
-                rl = SingaporeRules()
-                des =  rl.judge(req)
-            case Region.MACRO:
-                rl = MacroRules()
-                des =  rl.judge(req)
-            case _:
-                # TODO implementation
-                print(f"INFO: Cannot find checker for region: {req.trans_props.origArea}")
-
-        print("---------------------")
-        return des
-
-class RuleSameRegion(AllowRule):
-    def check(self, req: TransProps) -> Decision:
-        dest_region = find_region(req.trans_props.destArea)
-        orig_region = find_region(req.trans_props.origArea)
-
-        if dest_region == orig_region:
+        return self.explain(req).decision
+
+    def explain(self, req: TransProps) -> Verdict:
+        ''' Check a transborder request, give a decision and the rule which made it '''
+        book = self.book
+        book.prepare(req)
+        orig_region = book.index.infos[req.region_codes[0]].region
+        return self.explain_with(book, book.rule_sets.get(orig_region), req)
+
+    def judge_many(self, reqs) -> list:
+        ''' Check many transborder requests. Requests from the same region are
+        judged together, the decisions are returned in the input order. '''
+        return [verdict.decision for verdict in self.explain_many(reqs)]
+
+    def explain_many(self, reqs) -> list:
+        ''' Same as judge_many(), but returns a Verdict for each request.
+        Expiration is checked against the time of the call. '''
+        book = self.book
+        now = time.time()
+        groups = {}
+        total = 0
+        for req in reqs:
+            book.prepare(req)
+            orig_region = book.index.infos[req.region_codes[0]].region
+            groups.setdefault(orig_region, []).append((total, req))
+            total += 1
+
+        verdicts = [None] * total
+        for orig_region, group in groups.items():
+            rules = book.rule_sets.get(orig_region)
+            for idx, req in group:
+                verdicts[idx] = self.explain_with(book, rules, req, now)
+        return verdicts
+
+    def judge_batch(self, batch, now: float = None) -> list:
+        ''' Decisions of a ticketbatch.TicketBatch, in the order of its rows '''
+        return [verdict.decision for verdict in self.explain_batch(batch, now)]
+
+    def explain_batch(self, batch, now: float = None) -> list:
+        ''' Verdicts of a ticketbatch.TicketBatch. Rows with the same content are
+        judged once. Rows which expire before now (epoch seconds) are rejected. '''
+        if now is None:
+            now = time.time()
+        book = self.book
+        expired = Verdict(Decision.REJECT, RULE_EXPIRED, book.version)
+        expiries = batch.columns["expirationTime"]
+        verdicts = [None] * len(batch)
+        for req, rows in batch.groups():
+            book.prepare(req)
+            rules = book.rule_sets.get(book.index.infos[req.region_codes[0]].region)
+            if rules is None:
+                verdict = Verdict(Decision.TBD, RULE_NO_RULES, book.version)
+            else:
+                verdict = rules.decide(req)
+            for row in rows:
+                verdicts[row] = expired if expiries[row] < now else verdict
+        return verdicts
+
+    def explain_with(self, book, rules: Rules, req: TransProps, now: float = None) -> Verdict:
+        ''' Judge a request with the rules of its origin region in a book.
+        now: epoch seconds to check the expiration against, the current time if None '''
+        if tracer.enabled:
+            return self.traced_evaluate(book, rules, req, now)
+        return self.evaluate(book, rules, req, now)
+
+    def traced_evaluate(self, book, rules: Rules, req: TransProps, now: float = None) -> Verdict:
+        ''' evaluate() with a trace of the ticket, the decision and its time '''
+        ticket_id = req.trans_props.ticketId
+        tracer.emit("ticket", req.trans_props.info_text(), ticket=ticket_id)
+        start = time.perf_counter_ns()
+        verdict = self.evaluate(book, rules, req, now)
+        elapsed = time.perf_counter_ns() - start
+        tracer.emit("decision", f"Ticket {ticket_id}: {verdict.decision.name} ({verdict.rule})",
+                    ticket=ticket_id, decision=verdict.decision.name, rule=verdict.rule,
+                    version=verdict.version, ns=elapsed)
+        return verdict
+
+    def evaluate(self, book, rules: Rules, req: TransProps, now: float = None) -> Verdict:
+        if req.trans_props.check_expiration(now) is False:
+            return Verdict(Decision.REJECT, RULE_EXPIRED, book.version)
+
+        if rules is None:
+            # TODO implementation
+            if tracer.enabled:
+                tracer.emit("rule", f"INFO: Cannot find checker for region: {req.trans_props.origArea}",
+                            ticket=req.trans_props.ticketId)
+            return Verdict(Decision.TBD, RULE_NO_RULES, book.version)
+
+        if self.stats is not None:
+            return rules.decide_counted(req, self.stats)
+
+        if self.cache is None:
+            return rules.decide(req)
+
+        key = decision_key(req)
+        verdict = self.cache.get(key)
+        # A verdict of the old rules may be put by a ticket judged during a swap
+        if verdict is None or verdict.version != book.version:
+            verdict = rules.decide(req)
+            self.cache.put(key, verdict)
+        return verdict
+
+shared_lock = threading.Lock()
+shared = None
+
+def shared_checker() -> RuleChecker:
+    ''' The RuleChecker of this process, created on first use '''
+    global shared
+    if shared is None:
+        with shared_lock:
+            if shared is None:
+                shared = RuleChecker()
+    return shared
+
+def decision_key(req: TransProps) -> tuple:
+    ''' All fields of a request which the rules read. Requests with the same key
+    get the same decision, as long as they are not expired. The texts are keyed
+    by their scans, so variants the keyword matcher does not tell apart share a key.
+    The destination is also keyed by its name, which RuleInBlacklist reads: unknown
+    areas share a code, and so do the aliases of an area. '''
+    orig_code, dest_code = region_codes(req)
+    return (orig_code, dest_code, normalize(req.trans_props.destArea), reason_bases(req), data_bases(req),
+            prop_org_type(req, "sender_prop"), prop_org_type(req, "receiver_prop"),
+            prop_org_type(req, "receiver_org"))
+
+def prop_org_type(req: TransProps, name: str):
+    prop = getattr(req, name, None)
+    if prop is None:
+        return None
+    return prop.org_type
+
+class RuleSameRegion(PairRule, AllowRule):
+    outcomes = GO_OR_TBD
+
+    def check_pair(self, orig: Region, dest: RegionInfo) -> Decision:
+        if dest.region == orig:
             return Decision.GO
         return Decision.TBD
 
-class RuleGdprAdequacy(AllowRule):
-    def check(self, req: TransProps) -> Decision:
-        ''' GDPR Article 45 '''
-        descl = str.lower(req.trans_props.destArea)
-        match descl:
-            case "andorra" | "argentina" | "faroe islands" | "guernsey" | "israel" | "isle of man" | "japan":
-                print(f"Ticket has valid adequacy: {req.trans_props.ticketId}")
-                return Decision.GO
-            case "jersey" | "new zealand" | "republic of korea" | "switzerland " | "the united kingdom" | "uruguay":
-                print(f"Ticket has valid adequacy: {req.trans_props.ticketId}")
-                return Decision.GO
-            case "united kingdom":
-                # alias
-                print(f"Ticket has valid adequacy: {req.trans_props.ticketId}")
-                return Decision.GO
-            case "canada":
-                return eu_to_canada(req)
-            case "the united states" | "united states" | "usa":
-                return eu_to_us(req)
-            case _:
-                print(f"Ticket out of adequacy: {req.trans_props.ticketId}")
-                return Decision.TBD
+class RuleGdprAdequacy(PairRule, AllowRule):
+    outcomes = GO_OR_TBD
 
-class RuleGdprBcrs(AllowRule):
-    def check(self, req: TransProps) -> Decision:
-        ''' Binding corporate rules (Article 46) '''
-        reasonl = req.trans_props.reason.lower()
-        if reasonl.find("bcrs") != -1:
-            print(f"Ticket has valid BCRs: {req.trans_props.ticketId}")
-            return Decision.GO
-        if reasonl.find("binding corporate rules") != -1:
-            print(f"Ticket has valid BCRs: {req.trans_props.ticketId}")
+    def check_pair(self, orig: Region, dest: RegionInfo) -> Decision:
+        ''' GDPR Article 45 '''
+        if dest.gdpr_adequacy:
             return Decision.GO
+        if dest.region in (Region.CANADA, Region.USA):
+            # Depends on the organizations
+            return None
         return Decision.TBD
 
-class RuleGdprSCCs(AllowRule):
-    def check(self, req: TransProps) -> Decision:
-        ''' standard contractual clauses (Article 46) '''
-        reasonl = req.trans_props.reason.lower()
-        if reasonl.find("sccs") != -1:
-            print(f"Ticket has valid SCCs: {req.trans_props.ticketId}")
-            return Decision.GO
-        if reasonl.find("standard contractual clauses") != -1:
-            print(f"Ticket has valid SCCs: {req.trans_props.ticketId}")
-            return Decision.GO
-        return Decision.TBD
+    def check_ticket(self, req: TransProps) -> Decision:
+        if region_infos(req)[1].region == Region.CANADA:
+            return eu_to_canada(req)
+        return eu_to_us(req)
 
-class RuleGdprCoC(AllowRule):
-    def check(self, req: TransProps) -> Decision:
-        ''' an approved code of conduct pursuant to Article 40 '''
-        reasonl = req.trans_props.reason.lower()
-        if reasonl.find("code of conduct") != -1:
-            print(f"Ticket has valid CoC: {req.trans_props.ticketId}")
-            return Decision.GO
-        return Decision.TBD
+class RuleGdprBcrs(ReasonRule, AllowRule):
+    ''' Binding corporate rules (Article 46) '''
+    bases = ("BCRs",)
+
+class RuleGdprSCCs(ReasonRule, AllowRule):
+    ''' standard contractual clauses (Article 46) '''
+    bases = ("SCCs",)
 
-class GdprRules(Rules):
-    def __init__(self):
-        self.add_allow(RuleSameRegion())
-        self.add_allow(RuleGdprAdequacy())
-        self.add_allow(RuleGdprBcrs())
-        self.add_allow(RuleGdprSCCs())
-        self.add_allow(RuleGdprCoC())
+class RuleGdprCoC(ReasonRule, AllowRule):
+    ''' an approved code of conduct pursuant to Article 40 '''
+    bases = ("CoC",)
 
 def eu_to_canada(req: TransProps) -> Decision:
     ''' To Canada transborder '''
-    print("EU to CA: Checking the type of organizations...")
+    if tracer.enabled:
+        tracer.emit("rule", "EU to CA: Checking the type of organizations...", ticket=req.trans_props.ticketId)
     if hasattr(req, "sender_prop") is False:
         return Decision.TBD
     if hasattr(req, "receiver_prop") is False:
@@ -271,12 +498,15 @@ def eu_to_canada(req: TransProps) -> Decision:
         return Decision.TBD
     if org2 != OrgType.COMMERCIAL:
         return Decision.TBD
-    print(f"Go! Ticket within two commercial organizations: {req.trans_props.ticketId}")
+    if tracer.enabled:
+        tracer.emit("rule", f"Go! Ticket within two commercial organizations: {req.trans_props.ticketId}",
+                    ticket=req.trans_props.ticketId)
     return Decision.GO
 
 def eu_to_us(req: TransProps) -> Decision:
     ''' To US transborder '''
-    print("EU to US: Checking the type of organizations...")
+    if tracer.enabled:
+        tracer.emit("rule", "EU to US: Checking the type of organizations...", ticket=req.trans_props.ticketId)
     if hasattr(req, "sender_prop") is False:
         return Decision.TBD
     if hasattr(req, "receiver_prop") is False:
@@ -289,56 +519,51 @@ def eu_to_us(req: TransProps) -> Decision:
     if org2 != OrgType.COMMERCIAL:
         return Decision.TBD
 
-    reasonl = req.trans_props.reason.lower()
-    if reasonl.find("safe harbor") != -1:
+    matched = reason_bases(req)
+    if "Safe Harbor" in matched:
         # invalid on 2015 by EU court
-        print(f"Ticket has an invalid reason (Safe Harbor): {req.trans_props.ticketId}")
+        if tracer.enabled:
+            tracer.emit("rule", f"Ticket has an invalid reason (Safe Harbor): {req.trans_props.ticketId}",
+                        ticket=req.trans_props.ticketId, basis="Safe Harbor")
         return Decision.TBD
 
-    if reasonl.find("privacy shield") != -1:
+    if "privacy shield" in matched:
         # invalid on 2020 by EU court
-        print(f"Ticket has an invalid reason (privacy shield): {req.trans_props.ticketId}")
+        if tracer.enabled:
+            tracer.emit("rule", f"Ticket has an invalid reason (privacy shield): {req.trans_props.ticketId}",
+                        ticket=req.trans_props.ticketId, basis="privacy shield")
         return Decision.TBD
 
-    if reasonl.find("data privacy framework") != -1:
+    if "DPF" in matched:
         # Enable on 2023-07 by EU and USA
-        print(f"Ticket has a valid reason (DPF): {req.trans_props.ticketId}")
+        if tracer.enabled:
+            tracer.emit("rule", f"Ticket has a valid reason (DPF): {req.trans_props.ticketId}",
+                        ticket=req.trans_props.ticketId, basis="DPF")
         return Decision.GO
 
     return Decision.TBD
 
-class UkGdprRules(Rules):
-    def __init__(self):
-        self.add_allow(RuleSameRegion())
-        self.add_allow(RuleUkGdprAdequacy())
-        self.add_allow(RuleUkGdprBcrs())
-        self.add_allow(RuleUkGdprSCCs())
-        self.add_allow(RuleUkGdprCoC())
-
-class RuleUkGdprAdequacy(AllowRule):
+class RuleUkGdprAdequacy(PairRule, AllowRule):
+    outcomes = GO_OR_TBD
     eugdpr = RuleGdprAdequacy()
-    def check(self, req: TransProps) -> Decision:
-        dest = find_region(req.trans_props.destArea)
-        if dest == Region.EEA:
+
+    def check_pair(self, orig: Region, dest: RegionInfo) -> Decision:
+        if dest.eea:
             # UK and EEA
             return Decision.GO
 
-        res = self.eugdpr.check(req)
-        if res == Decision.GO:
+        res = self.eugdpr.check_pair(orig, dest)
+        if res != Decision.TBD:
+            return res
+
+        if dest.uk_adequacy:
             return Decision.GO
-        
-        descl = str.lower(req.trans_props.destArea)
-        match descl:
-            case "Gibraltar" | "korea":
-                print(f"Ticket has valid adequacy: {req.trans_props.ticketId}")
-                return Decision.GO
-            case "canada":
-                return uk_to_canada(req)
-            case "the united states" | "united states" | "usa":
-                return uk_to_us(req)
-            case _:
-                print(f"Ticket out of adequacy: {req.trans_props.ticketId}")
-                return Decision.TBD
+        return Decision.TBD
+
+    def check_ticket(self, req: TransProps) -> Decision:
+        if region_infos(req)[1].region == Region.CANADA:
+            return uk_to_canada(req)
+        return uk_to_us(req)
 
 def uk_to_canada(req: TransProps) -> Decision:
     return eu_to_canada(req)
@@ -349,67 +574,38 @@ def uk_to_us(req: TransProps) -> Decision:
 class RuleUkGdprBcrs(RuleGdprBcrs):
     ' Same as in EU '
 
-class RuleUkGdprSCCs(AllowRule):
-    def check(self, req: TransProps) -> Decision:
-        ''' standard contractual clauses '''
-        reasonl = req.trans_props.reason.lower()
-        if reasonl.find("sccs") != -1:
-            print(f"Ticket has valid SCCs: {req.trans_props.ticketId}")
-            return Decision.GO
-        if reasonl.find("standard contractual clauses") != -1:
-            print(f"Ticket has valid SCCs: {req.trans_props.ticketId}")
-            return Decision.GO
-        if reasonl.find("international data transfer agreement") != -1:
-            print(f"Ticket has valid IDTAs: {req.trans_props.ticketId}")
-            return Decision.GO
-        return Decision.TBD
+class RuleUkGdprSCCs(ReasonRule, AllowRule):
+    ''' standard contractual clauses '''
+    bases = ("SCCs", "IDTAs")
     
 class RuleUkGdprCoC(RuleGdprCoC):
     ' Same as in EU '
 
-class CanadaRules(Rules):
-    def __init__(self):
-        self.add_allow(RuleSameRegion())
-        self.add_risk(RuleCaOPC())
-
-class RuleCaOPC(RiskRule):
+class RuleCaOPC(PairRule, RiskRule):
     ' Rules by OPC (Canada) '   
-    concern_regions = [Region.CHINA, Region.RUSSIA] # Only for DEMO
+    concern_regions = (Region.CHINA, Region.RUSSIA) # Only for DEMO
 
-    def check(self, req: TransProps) -> Decision:
-        dest = find_region(req.trans_props.destArea)
-        if dest in self.concern_regions:
+    def check_pair(self, orig: Region, dest: RegionInfo) -> Decision:
+        if dest.region in self.concern_regions:
             # UK and EEA
             return Decision.RISK
+        return Decision.TBD
 
-class UsaRules(Rules):
-    def __init__(self):
-        self.add_allow(RuleSameRegion())
-        self.add_risk(RuleUsaFtc())
-
-class RuleUsaFtc(RiskRule):
+class RuleUsaFtc(PairRule, RiskRule):
     ' Rules by FTC '   
-    concern_regions = [Region.CHINA, Region.RUSSIA] # Only for DEMO
+    concern_regions = (Region.CHINA, Region.RUSSIA) # Only for DEMO
 
-    def check(self, req: TransProps) -> Decision:
-        dest = find_region(req.trans_props.destArea)
-        if dest in self.concern_regions:
+    def check_pair(self, orig: Region, dest: RegionInfo) -> Decision:
+        if dest.region in self.concern_regions:
             # UK and EEA
             return Decision.RISK
+        return Decision.TBD
 
-class VietnamRules(Rules):
-    def __init__(self):
-        self.add_allow(RuleSameRegion())
-        self.add_allow(RuleVnLocalStorage())
-
-class RuleLocalStorage(AllowRule):    
-    def check(self, req: TransProps) -> Decision:
-        ''' Several contries require local storage of personal data. 
-         If fulfilled, transborder action can be permitted. '''
-        reasonl = req.trans_props.reason.lower()
-        if reasonl.find("local storage") != -1:
-            return Decision.GO
-        return Decision.RISK
+class RuleLocalStorage(ReasonRule, AllowRule):
+    ''' Several contries require local storage of personal data. 
+     If fulfilled, transborder action can be permitted. '''
+    bases = ("local storage",)
+    miss = Decision.RISK
 
 class RuleVnLocalStorage(RuleLocalStorage):
     ''' 53/2022/ND‑CP (local storage) '''
@@ -417,135 +613,77 @@ class RuleVnLocalStorage(RuleLocalStorage):
 class RuleInLocalStorage(RuleLocalStorage):
     ''' Digital Personal Data Protection Act, 2023 (Article 40: local storage) '''
 
-class IndianRules(Rules):
-    def __init__(self):
-        self.add_allow(RuleSameRegion())
-        self.add_allow(RuleInLocalStorage())
-        self.add_deny(RuleInFinancial())
-        self.add_deny(RuleInBlacklist())
-
 class RuleInFinancial(DenyRule):
+    kinds = ("financial",)
+
     def check(self, req: TransProps) -> Decision:
-        desc = req.trans_props.dataType.lower()
-        if desc.find("financial") != -1:
-            return Decision.REJECT
-        if desc.find("payment") != -1:
+        if data_bases(req).isdisjoint(self.kinds) is False:
             return Decision.REJECT
+        return Decision.TBD
 
 class RuleInBlacklist(DenyRule):
     'Article 16 clause 1 of DPDP Act'
+    blacklist = () # The banned regions' name
+
     def check(self, req: TransProps) -> Decision:
         'Article 16 clause 1'
-        blacklist = [] # The banned regions' name
-        if req.trans_props.destArea in blacklist:
+        if normalize(req.trans_props.destArea) in self.blacklist:
             return Decision.REJECT
         return Decision.TBD
 
-class SingaporeRules(Rules):
-    def __init__(self):
-        self.add_allow(RuleSameRegion())
-        self.add_allow(RuleSgInTransit())
-
-        # Personal Data Protection Regulations, 2021, Article 26
-        self.add_allow(RuleUserConcent())
-        self.add_allow(RuleSgDpas())
-        self.add_allow(RuleSgCoC())
-        self.add_allow(RuleSgCerts())
-
-class RuleInTransit(AllowRule):    
-    def check(self, req: TransProps) -> Decision:
-        ' From outside and to outside, no additional processing '
-        reasonl = req.trans_props.reason.lower()
-        if reasonl.find("only transit") != -1:
-            return Decision.GO
-        return Decision.RISK
+class RuleInTransit(ReasonRule, AllowRule):
+    ' From outside and to outside, no additional processing '
+    bases = ("transit",)
+    miss = Decision.RISK
 
 class RuleSgInTransit(RuleInTransit):
     ' Personal Data Protection Regulations, 2021, Article 10 '
 
-class RuleUserConcent(AllowRule):    
-    def check(self, req: TransProps) -> Decision:
-        ' Several regions allow user concent as a valid reason'
-        reasonl = req.trans_props.reason.lower()
-        if reasonl.find("user concent") != -1:
-            return Decision.GO
-        return Decision.RISK
+class RuleUserConcent(ReasonRule, AllowRule):
+    ' Several regions allow user concent as a valid reason'
+    bases = ("user concent",)
+    miss = Decision.RISK
 
-class RuleSgDpas(AllowRule):    
-    def check(self, req: TransProps) -> Decision:
-        ' Personal Data Protection Regulations, 2021, Article 26 '
-        reasonl = req.trans_props.reason.lower()
-        if reasonl.find("dpa") != -1:
-            return Decision.GO
-        if reasonl.find("data processing agreement") != -1:
-            return Decision.GO
-        return Decision.RISK
+class RuleSgDpas(ReasonRule, AllowRule):
+    ' Personal Data Protection Regulations, 2021, Article 26 '
+    bases = ("DPAs",)
+    miss = Decision.RISK
 
 class RuleSgCoC(RuleGdprCoC):
     ' Same as in EU '
 
-class RuleSgCerts(AllowRule):
+class RuleSgCerts(ReasonRule, AllowRule):
     ' Personal Data Protection Regulations, 2021, Article 26. Should be changed to constraints '
-    def check(self, req: TransProps) -> Decision:
-        reasonl = req.trans_props.reason.lower()
-        if reasonl.find("apec cbpr") != -1:
-            return Decision.GO
-        if reasonl.find("apec prp") != -1:
-            return Decision.GO
-        return Decision.RISK
-
-class ChinaRules(Rules):
-    def __init__(self):
-        self.add_allow(RuleSameRegion())
-        self.add_allow(RuleCnInTransit())
-        self.add_allow(RuleCnFTZs())
-        self.add_allow(RuleCnBusinessNeeds())
-        self.add_allow(RuleCnNoPIIs())
-
-        self.add_risk(RuleCnImportant())
-        self.add_risk(RuleCnCIIs())
-        self.add_risk(RuleCnNoCIIs())
+    bases = ("APEC certs",)
+    miss = Decision.RISK
 
 class RuleCnInTransit(RuleInTransit):
     ' Facilitate and regulate regulations for cross-border data flows, March 2024, Article 4 '
 
 class RuleCnNoPIIs(AllowRule):
     ' Facilitate and regulate regulations for cross-border data flows, March 2024, Article 3 '
+    outcomes = frozenset((Decision.GO, Decision.RISK))
+
     def check(self, req: TransProps) -> Decision:
-        if is_pii(req.trans_props.dataType):
+        kinds = data_bases(req)
+        if "PII" in kinds:
             return Decision.RISK
-        if is_cn_important(req.trans_props.dataType):
+        if "important" in kinds:
             return Decision.RISK
         return Decision.GO
 
-class RuleCnBusinessNeeds(AllowRule):
+class RuleCnBusinessNeeds(ReasonRule, AllowRule):
     ' Facilitate and regulate regulations for cross-border data flows, March 2024, Article 5 '
-    def check(self, req: TransProps) -> Decision:
-        reasonl = req.trans_props.reason.lower()
-        if reasonl.find("contract") != -1:
-            return Decision.GO
-        if reasonl.find("hr") != -1:
-            return Decision.GO
-        if reasonl.find("human resource") != -1:
-            return Decision.GO
-        if reasonl.find("emergency") != -1:
-            return Decision.GO
-        return Decision.TBD
+    bases = ("business needs",)
 
-class RuleCnFTZs(AllowRule):
+class RuleCnFTZs(ReasonRule, AllowRule):
     ' Facilitate and regulate regulations for cross-border data flows, March 2024, Article 6 '
-    def check(self, req: TransProps) -> Decision:
-        reasonl = req.trans_props.reason.lower()
-        if reasonl.find("free trade zone") != -1:
-            return Decision.GO
-        if reasonl.find("ftz") != -1:
-            return Decision.GO
-        return Decision.TBD
+    bases = ("FTZs",)
 
 class RuleCnImportant(RiskRule):
     ' Facilitate and regulate regulations for cross-border data flows, March 2024, Article 2 '
     def check(self, req: TransProps) -> Decision:
-        if is_cn_important(req.trans_props.dataType):
+        if "important" in data_bases(req):
             return Decision.RISK
         return Decision.TBD
 
@@ -558,8 +696,9 @@ class RuleCnCIIs(RiskRule):
         if req.receiver_org.org_type != OrgType.CII:
             return Decision.TBD
         
-        if is_pii(req.trans_props.dataType) or is_cn_important(req.trans_props.dataType):
-            if reason_security_assessment(req.trans_props.reason) is False:
+        kinds = data_bases(req)
+        if "PII" in kinds or "important" in kinds:
+            if "security assessment" not in reason_bases(req):
                 return Decision.REJECT
             else:
                 # SHOULD review the assessment report
@@ -572,43 +711,39 @@ class RuleCnNoCIIs(RiskRule):
     ' Should be reviewed manually. '
 
 def is_pii(datadesc: str) -> bool:
-    desc = datadesc.lower()
-    if desc.find("pii") != -1:
-        return True
-    if desc.find("personal") != -1:
-        return True
-    return False
+    from rulebook import default_book
+    return "PII" in default_book().data_matcher.scan(datadesc)
 
 def is_cn_important(datadesc: str) -> bool:
-    desc = datadesc.lower()
-    if desc.find("important") != -1:
-        return True
-    return False
+    from rulebook import default_book
+    return "important" in default_book().data_matcher.scan(datadesc)
 
 def reason_security_assessment(reason: str) -> bool:
-    reasonl = reason.lower()
-    return reasonl.find("security assessment") != -1
+    from rulebook import default_book
+    return "security assessment" in default_book().reason_matcher.scan(reason)
 
-class JapanRules(Rules):
-    def __init__(self):
-        self.add_allow(RuleSameRegion())
-        self.add_allow(RuleCBPR())
-
-class RuleCBPR(AllowRule):
+class RuleCBPR(PairRule, AllowRule):
     ' Global Cross-Border Privacy Rules Declaration, Apr. 2022 '
+    outcomes = GO_OR_TBD
 
-    def check(self, req: TransProps) -> Decision:
-        res = is_cbpr(req.trans_props.destArea)
-        if res is True:
+    def check_pair(self, orig: Region, dest: RegionInfo) -> Decision:
+        if dest.cbpr:
             return Decision.GO
         return Decision.TBD
 
-class MacroRules(Rules):
-    def __init__(self):
-        self.add_allow(RuleSameRegion())
-        self.add_allow(RuleGreaterBayArea())
-
 class RuleGreaterBayArea(AllowRule):
+    outcomes = frozenset((Decision.TBD,))
+
     def check(self, req: TransProps) -> Decision:
         # TODO Agreements of Great Bay Area (Guangdong, Hong Kong and Macro)
         return Decision.TBD
+
+def rule_kinds() -> dict:
+    ''' Name => class of every rule, for the definitions in rules.json '''
+    kinds = {}
+    pending = [Rule]
+    while pending:
+        cls = pending.pop()
+        kinds[cls.__name__] = cls
+        pending.extend(cls.__subclasses__())
+    return kinds
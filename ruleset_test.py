@@ -0,0 +1,181 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import json
+from pathlib import Path
+import tempfile
+from types import SimpleNamespace
+import rulebook
+import ruleset
+import propset
+import regions
+import tracing
+import transettings
+import unittest
+
+def make_ticket(orig: str, dest: str, reason: str, data_type: str = "User Privacy") -> propset.TransProps:
+    ' A ticket which expires in one week '
+    expiration_date = transettings.utc_now().replace(microsecond=0) + timedelta(weeks=1)
+    ts = transettings.TranSettings()
+    ts.ticketId = f"{orig}-{dest}-{reason}"
+    ts.senderId = "sender1"
+    ts.receiverId = "Bob"
+    ts.receiverKey = "receiver1"
+    ts.expectTime = expiration_date.isoformat() + "Z"
+    ts.expirationTime = expiration_date.isoformat() + "Z"
+    ts.origArea = orig
+    ts.destArea = dest
+    ts.dataType = data_type
+    ts.dataVolume = "10000"
+    ts.dataUnit = "person"
+    ts.dataHash = "5usHGst9SANMEViiINEDrZ37UZY="
+    ts.reason = reason
+    return propset.TransProps(ts)
+
+class Test_RuleChecker(unittest.TestCase):
+    def test_rules_built_once(self):
+        checker = ruleset.RuleChecker()
+        gdpr = checker.rule_sets[ruleset.Region.EEA]
+        total = len(gdpr.allow_rules)
+        for _ in range(5):
+            checker.judge(make_ticket("Germany", "China", "code of conduct"))
+        self.assertEqual(len(gdpr.allow_rules), total)
+        book = rulebook.load_book(cache_dir=None)
+        self.assertEqual(len(book.rule_sets[ruleset.Region.EEA].allow_rules), total)
+
+    def test_compiled_rules_are_frozen(self):
+        rules = ruleset.Rules(ruleset.Region.EEA).compile()
+        with self.assertRaises(RuntimeError):
+            rules.add_allow(ruleset.RuleGdprCoC())
+
+    def test_decisions(self):
+        checker = ruleset.RuleChecker()
+        self.assertEqual(checker.judge(make_ticket("Germany", "France", "none")), ruleset.Decision.GO)
+        self.assertEqual(checker.judge(make_ticket("Germany", "China", "SCCs")), ruleset.Decision.GO)
+        self.assertEqual(checker.judge(make_ticket("Germany", "China", "none")), ruleset.Decision.TBD)
+        self.assertEqual(checker.judge(make_ticket("Canada", "China", "none")), ruleset.Decision.RISK)
+        self.assertEqual(checker.judge(make_ticket("India", "Japan", "x", "payment")), ruleset.Decision.REJECT)
+
+    def test_judge_many_keeps_order(self):
+        checker = ruleset.RuleChecker()
+        reqs = [make_ticket("Germany", "China", "SCCs"),
+                make_ticket("Canada", "China", "none"),
+                make_ticket("Mars", "China", "none"),
+                make_ticket("Germany", "China", "none"),
+                make_ticket("India", "Japan", "x", "payment")]
+        expected = [checker.judge(req) for req in reqs]
+        self.assertEqual(checker.judge_many(reqs), expected)
+        self.assertEqual(checker.judge_many(iter(reqs)), expected)
+        self.assertEqual(checker.judge_many([]), [])
+
+    def test_explain(self):
+        checker = ruleset.RuleChecker()
+        verdict = checker.explain(make_ticket("Germany", "China", "SCCs"))
+        version = checker.book.version
+        self.assertEqual(verdict, (ruleset.Decision.GO, "RuleGdprSCCs", version))
+        verdict = checker.explain(make_ticket("Mars", "China", "SCCs"))
+        self.assertEqual(verdict, (ruleset.Decision.TBD, ruleset.RULE_NO_RULES, version))
+
+    def test_pack(self):
+        req = make_ticket("Germany", "China", "SCCs")
+        req.set_receiver_prop({"credentialSubject": {"userName": "Bob",
+            "orgnization": {"name": "Example.Org", "type": "company"}}})
+        copy = propset.TransProps.unpack(req.pack())
+        self.assertEqual(copy.trans_props.to_tuple(), req.trans_props.to_tuple())
+        self.assertEqual(copy.receiver_prop.org_type, "company")
+        self.assertFalse(hasattr(copy, "sender_prop"))
+
+    def test_pair_table(self):
+        checker = ruleset.RuleChecker()
+        areas = ["Germany", "United Kingdom", "China", "Canada", "USA", "India",
+                   "Japan", "Singapore", "Vietnam", "Macro", "Israel", "Taiwan", "Atlantis"]
+        for orig in areas:
+            rules = checker.rule_sets.get(ruleset.find_region(orig))
+            if rules is None:
+                continue
+            for dest in areas:
+                req = make_ticket(orig, dest, "none")
+                expected = [rl.check(req) for rl in rules.allow_rules + rules.risk_rules]
+                deny_pairs, allow_pairs, risk_pairs = rules.pair_outcomes(regions.area_code(dest))
+                for rl, res, exp in zip(rules.allow_rules + rules.risk_rules, allow_pairs + risk_pairs, expected):
+                    if res is None:
+                        res = rl.check_ticket(req)
+                    self.assertEqual(res == ruleset.Decision.TBD, exp in (ruleset.Decision.TBD, None))
+                    if res != ruleset.Decision.TBD:
+                        self.assertEqual(res, exp)
+
+    def test_decision_cache(self):
+        checker = ruleset.RuleChecker(cache_size=2)
+        plain = ruleset.RuleChecker()
+        reqs = [make_ticket("Germany", "China", "SCCs"),
+                make_ticket("Germany", "China", "SCCs"),
+                make_ticket("Canada", "China", "none"),
+                make_ticket("India", "Japan", "x", "payment"),
+                make_ticket("Germany", "China", "SCCs")]
+        self.assertEqual(checker.explain_many(reqs), plain.explain_many(reqs))
+        stats = checker.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (2, 3, 1))
+
+        checker.load_book(checker.book)
+        self.assertEqual(checker.cache.stats()["size"], 0)
+
+        # Case and spacing variants of the texts share a decision
+        variants = [make_ticket("Germany", "China", "SCCs", "User Privacy"),
+                    make_ticket("Germany", "China", "  sccs ", "user  PRIVACY")]
+        self.assertEqual(checker.explain_many(variants), plain.explain_many(variants))
+        self.assertEqual(checker.cache.stats()["hits"], 3)
+
+    def test_decision_cache_blacklist(self):
+        defs = json.loads(rulebook.DEFAULT_RULES.read_text(encoding="utf-8"))
+        defs["jurisdictions"]["INDIA"]["deny"].append({"rule": "RuleInBlacklist", "blacklist": ["North Korea", "uk"]})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "rules.json"
+            path.write_text(json.dumps(defs), encoding="utf-8")
+            book = rulebook.load_book(path, cache_dir=None)
+        # Unknown areas share a code, aliases too, but not a blacklist
+        reqs = [make_ticket("India", dest, "local storage")
+                for dest in ["Mars", "North Korea", "United Kingdom", "UK"]] * 2
+        expected = ruleset.RuleChecker(book=book).judge_many(reqs)
+        self.assertEqual(expected[:4], [ruleset.Decision.GO, ruleset.Decision.REJECT,
+                                        ruleset.Decision.GO, ruleset.Decision.REJECT])
+        self.assertEqual(ruleset.RuleChecker(cache_size=16, book=book).judge_many(reqs), expected)
+
+    def test_tracing(self):
+        checker = ruleset.RuleChecker()
+        sink = tracing.MemorySink()
+        tracing.tracer.enable(sink)
+        try:
+            checker.judge(make_ticket("Germany", "China", "SCCs"))
+        finally:
+            tracing.tracer.disable()
+        decisions = [rec for rec in sink.records if rec["event"] == "decision"]
+        self.assertEqual(len(decisions), 1)
+        self.assertEqual(decisions[0]["rule"], "RuleGdprSCCs")
+        self.assertEqual(decisions[0]["decision"], "GO")
+
+        total = len(sink.records)
+        checker.judge(make_ticket("Germany", "China", "SCCs"))
+        self.assertEqual(len(sink.records), total)
+
+    def test_threads(self):
+        reqs = [make_ticket(orig, dest, reason)
+                for orig in ["Germany", "United Kingdom", "China", "Singapore"]
+                for dest in ["France", "USA", "China", "Japan"]
+                for reason in ["SCCs", "contract", "DPA", "none"]] * 20
+        expected = ruleset.RuleChecker().judge_many(reqs)
+        checker = ruleset.shared_checker()
+        checker_cached = ruleset.RuleChecker(cache_size=16)
+        self.assertIs(ruleset.shared_checker(), checker)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            self.assertEqual(list(pool.map(checker.judge, reqs)), expected)
+            self.assertEqual(list(pool.map(checker_cached.judge, reqs)), expected)
+
+    def test_compiled_rules_are_immutable(self):
+        rules = ruleset.RuleChecker().rule_sets[ruleset.Region.EEA]
+        with self.assertRaises(RuntimeError):
+            rules.allow_rules = ()
+        with self.assertRaises(ValueError):
+            book = SimpleNamespace(rule_sets={ruleset.Region.EEA: ruleset.Rules(ruleset.Region.EEA)})
+            ruleset.RuleChecker().load_book(book)
+
+if __name__ == '__main__':
+    unittest.main()
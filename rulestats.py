@@ -0,0 +1,98 @@
+import copy
+import threading
+
+from rulebook import RuleBook
+from ruleset import Decision, Rule, Rules, rule_name
+
+class RuleStats:
+    ''' How often each rule ran and decided, and the time it took.
+    Filled by a RuleChecker created with stats=, safe to share between threads. '''
+
+    def __init__(self):
+        # (Region, rule name) => [runs, hits, ns]
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def record(self, region, rl: Rule, hit: bool, ns: int):
+        key = (region, rule_name(rl))
+        with self.lock:
+            counter = self.counters.get(key)
+            if counter is None:
+                counter = [0, 0, 0]
+                self.counters[key] = counter
+            counter[0] += 1
+            counter[1] += hit
+            counter[2] += ns
+
+    def counter(self, region, rl: Rule) -> tuple:
+        ''' (runs, hits, ns) of a rule in the rules of a region '''
+        with self.lock:
+            return tuple(self.counters.get((region, rule_name(rl)), (0, 0, 0)))
+
+    def export(self) -> list:
+        ''' Counters of all rules, the most time consuming first '''
+        with self.lock:
+            items = [(key, tuple(counter)) for key, counter in self.counters.items()]
+        rows = []
+        for (region, name), (runs, hits, ns) in items:
+            rows.append({"region": region.name, "rule": name, "runs": runs, "hits": hits,
+                         "ns": ns, "meanNs": ns // runs if runs else 0})
+        rows.sort(key=lambda row: row["ns"], reverse=True)
+        return rows
+
+def can_reject(rl: Rule) -> bool:
+    return Decision.REJECT in rl.outcomes
+
+def same_decisions(declared: tuple, order: tuple) -> bool:
+    ''' Whether allow rules in another order give every ticket the same decision.
+    Allow rules stop at the first GO or REJECT. Between two rules which may
+    REJECT, the others can only stop with GO, so the ticket gets GO if any of
+    them says GO, whatever their order. An order is therefore safe if it keeps
+    every rule which may REJECT in its place, and only moves the others among
+    the neighbours they had. The rule named in a Verdict may be another one. '''
+    if len(declared) != len(order):
+        return False
+    start = 0
+    for i in range(len(declared) + 1):
+        if i < len(declared) and can_reject(declared[i]) is False:
+            continue
+        # declared[start:i] is a run of rules which never REJECT
+        if {id(rl) for rl in declared[start:i]} != {id(rl) for rl in order[start:i]}:
+            return False
+        if i < len(declared) and order[i] is not declared[i]:
+            return False
+        start = i + 1
+    return True
+
+def adaptive_order(rules: Rules, stats: RuleStats) -> tuple:
+    ''' Allow rules with the most decisive ones first, as far as same_decisions()
+    permits. Ties keep the cheaper one first, then the declared order. '''
+    def rank(rl: Rule):
+        runs, hits, ns = stats.counter(rules.region, rl)
+        return (-hits, ns / runs if runs else 0)
+
+    order = []
+    run = []
+    for rl in rules.allow_rules:
+        if can_reject(rl):
+            order.extend(sorted(run, key=rank))
+            order.append(rl)
+            run = []
+        else:
+            run.append(rl)
+    order.extend(sorted(run, key=rank))
+    return tuple(order)
+
+def adapted_book(book: RuleBook, stats: RuleStats) -> RuleBook:
+    ''' A copy of a book whose allow rules run in adaptive_order(). Its decisions
+    are the same, so is its version. Use it with RuleChecker.load_book(). '''
+    rule_sets = {}
+    for region, rules in book.rule_sets.items():
+        order = adaptive_order(rules, stats)
+        if same_decisions(rules.allow_rules, order) is False:
+            raise RuntimeError(f"Unsafe order of the allow rules of {region.name}")
+        rule_sets[region] = rules.with_allow_order(order)
+
+    adapted = copy.copy(book)
+    adapted.rule_sets = rule_sets
+    return adapted
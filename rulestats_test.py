@@ -0,0 +1,40 @@
+import unittest
+
+import rulestats
+import ruleset
+from ruleset_test import make_ticket
+
+class Test_RuleStats(unittest.TestCase):
+    def test_adaptive_order(self):
+        reqs = [make_ticket(orig, dest, reason)
+                for orig in ["Germany", "United Kingdom", "China", "Singapore"]
+                for dest in ["France", "USA", "China", "Japan", "Israel"]
+                for reason in ["SCCs", "BCRs", "transit", "user concent", "none"]]
+        expected = ruleset.RuleChecker().judge_many(reqs)
+        stats = rulestats.RuleStats()
+        checker = ruleset.RuleChecker(stats=stats)
+        busy = [make_ticket("Germany", "China", "SCCs")] * 20
+        self.assertEqual(checker.judge_many(reqs + busy), expected + [ruleset.Decision.GO] * 20)
+        rows = stats.export()
+        self.assertEqual([row["ns"] for row in rows], sorted((row["ns"] for row in rows), reverse=True))
+        scc = [row for row in rows if (row["region"], row["rule"]) == ("EEA", "RuleGdprSCCs")]
+        self.assertEqual(scc[0]["hits"], 20 + 2)
+
+        checker.load_book(rulestats.adapted_book(checker.book, stats))
+        allow_rules = checker.rule_sets[ruleset.Region.EEA].allow_rules
+        self.assertEqual(ruleset.rule_name(allow_rules[0]), "RuleGdprSCCs")
+        self.assertEqual(checker.judge_many(reqs), expected)
+        checker.stats = None
+        self.assertEqual(checker.judge_many(reqs), expected)
+
+    def test_same_decisions(self):
+        go_only = [ruleset.RuleSameRegion(), ruleset.RuleCBPR(), ruleset.RuleGdprSCCs()]
+        rejecting = ruleset.RuleGdprBcrs()
+        rejecting.miss = ruleset.Decision.REJECT
+        declared = (go_only[0], go_only[1], rejecting, go_only[2])
+        self.assertTrue(rulestats.same_decisions(declared, (go_only[1], go_only[0], rejecting, go_only[2])))
+        self.assertFalse(rulestats.same_decisions(declared, (go_only[0], rejecting, go_only[1], go_only[2])))
+        self.assertFalse(rulestats.same_decisions(declared, (go_only[2], go_only[1], rejecting, go_only[0])))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+from array import array
+from datetime import datetime, timezone
+
+from propset import TransProps, SenderPropSet, ReceiverPropSet, SenderOrgPropSet, ReceiverOrgPropSet
+from transettings import TranSettings, SETTING_FIELDS, parse_epoch
+
+# Fields of TranSettings stored as codes into the string table of a batch
+CODED_FIELDS = ("senderId", "receiverId", "receiverKey", "origArea", "destArea",
+                "dataType", "dataVolume", "dataUnit", "reason", "approver")
+# Fields stored as epoch seconds
+TIME_FIELDS = ("expectTime", "expirationTime")
+# Fields unique to each ticket, stored as they are
+TEXT_FIELDS = ("ticketId", "dataHash")
+
+# Properties of TransProps, stored as codes into the packed properties of a batch
+PROP_CLASSES = {
+    "sender_prop": SenderPropSet,
+    "receiver_prop": ReceiverPropSet,
+    "sender_org": SenderOrgPropSet,
+    "receiver_org": ReceiverOrgPropSet,
+}
+
+# Code of a missing field or property
+MISSING = 0
+
+class TicketBatch:
+    ''' Many tickets as columns (struct of arrays), one row per ticket.
+    Texts which repeat across tickets are stored once and referred by codes,
+    times are epoch seconds and properties are shared packed tuples.
+    RuleChecker.judge_batch() judges a batch without building every request. '''
+
+    def __init__(self):
+        self.strings = [""]
+        self.string_codes = {"": MISSING}
+        self.props = [None]
+        self.prop_codes = {None: MISSING}
+        self.columns = {}
+        for name in CODED_FIELDS:
+            self.columns[name] = array("I")
+        for name in TIME_FIELDS:
+            self.columns[name] = array("q")
+        for name in TEXT_FIELDS:
+            self.columns[name] = []
+        for name in PROP_CLASSES:
+            self.columns[name] = array("I")
+
+    @classmethod
+    def from_requests(cls, reqs) -> 'TicketBatch':
+        batch = cls()
+        batch.extend(reqs)
+        return batch
+
+    def __len__(self):
+        return len(self.columns["ticketId"])
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self.request(row)
+
+    def extend(self, reqs):
+        for req in reqs:
+            self.append(req)
+
+    def append(self, req: TransProps):
+        ts = req.trans_props
+        for name in CODED_FIELDS:
+            self.columns[name].append(self.string_code(getattr(ts, name, "")))
+        for name in TIME_FIELDS:
+            self.columns[name].append(time_epoch(getattr(ts, name, "")))
+        for name in TEXT_FIELDS:
+            self.columns[name].append(getattr(ts, name, ""))
+        for name in PROP_CLASSES:
+            prop = getattr(req, name, None)
+            self.columns[name].append(self.prop_code(None if prop is None else prop.pack()))
+
+    def string_code(self, text: str) -> int:
+        code = self.string_codes.get(text)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(text)
+            self.string_codes[text] = code
+        return code
+
+    def prop_code(self, packed: tuple) -> int:
+        code = self.prop_codes.get(packed)
+        if code is None:
+            code = len(self.props)
+            self.props.append(packed)
+            self.prop_codes[packed] = code
+        return code
+
+    def settings(self, row: int) -> TranSettings:
+        ''' The TranSettings of a row '''
+        values = []
+        for name in SETTING_FIELDS:
+            val = self.columns[name][row]
+            if name in CODED_FIELDS:
+                val = self.strings[val]
+            elif name in TIME_FIELDS:
+                val = epoch_time(val)
+            values.append(val)
+        return TranSettings.from_tuple(tuple(values))
+
+    def request(self, row: int) -> TransProps:
+        ''' The TransProps of a row '''
+        req = TransProps(self.settings(row))
+        for name, prop_cls in PROP_CLASSES.items():
+            packed = self.props[self.columns[name][row]]
+            if packed is not None:
+                setattr(req, name, prop_cls.from_packed(packed))
+        return req
+
+    def groups(self) -> list:
+        ''' [(request, rows)] of the rows with the same decision-relevant fields.
+        The request is the one of the first row. '''
+        keys = zip(self.columns["origArea"], self.columns["destArea"],
+                   self.columns["reason"], self.columns["dataType"],
+                   self.columns["sender_prop"], self.columns["receiver_prop"],
+                   self.columns["receiver_org"])
+        rows = {}
+        for row, key in enumerate(keys):
+            group = rows.get(key)
+            if group is None:
+                rows[key] = [row]
+            else:
+                group.append(row)
+        return [(self.request(group[0]), group) for group in rows.values()]
+
+def time_epoch(text: str) -> int:
+    ''' "2024-10-04T14:10:49Z" => epoch seconds, 0 if missing '''
+    return parse_epoch(text) or 0
+
+def epoch_time(epoch: int) -> str:
+    ''' Back from time_epoch(), as UTC in the format of the tickets '''
+    if epoch == 0:
+        return ""
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None).isoformat() + "Z"
@@ -0,0 +1,34 @@
+import unittest
+
+import propset
+import ruleset
+import ticketbatch
+import transettings
+
+TRANS_TICKET_NUM = 10
+
+class Test_TicketBatch(unittest.TestCase):
+    def test_compact(self):
+        ts = transettings.TranSettings.from_tuple(("t1",) + ("".join(["Ger", "many"]),) * 13)
+        self.assertFalse(hasattr(ts, "__dict__"))
+        self.assertFalse(hasattr(propset.TransProps(ts), "__dict__"))
+        other = transettings.TranSettings.from_tuple(("t2",) + ("".join(["Germ", "any"]),) * 13)
+        self.assertIs(other.origArea, ts.origArea)
+
+    def test_batch(self):
+        reqs = [propset.TransProps(ts) for ts in transettings.TransGenerator().generate_settings(TRANS_TICKET_NUM)]
+        user = {"credentialSubject": {"userName": "Bob", "orgnization": {"name": "n", "type": "company"}}}
+        reqs[0].set_sender_prop(user)
+        reqs[0].set_receiver_prop(user)
+        reqs[1].trans_props.expirationTime = "2020-01-01T00:00:00Z"
+
+        batch = ticketbatch.TicketBatch.from_requests(reqs)
+        self.assertEqual(len(batch), TRANS_TICKET_NUM)
+        self.assertEqual([req.pack() for req in batch], [req.pack() for req in reqs])
+
+        checker = ruleset.RuleChecker()
+        self.assertEqual(checker.judge_batch(batch), checker.judge_many(reqs))
+        self.assertEqual(checker.judge_batch(batch)[1], ruleset.Decision.REJECT)
+
+if __name__ == '__main__':
+    unittest.main()
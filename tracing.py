@@ -0,0 +1,90 @@
+import json
+import sys
+import threading
+import time
+
+class Tracer:
+    ''' Structured traces of the judging path, e.g. which rule made a decision.
+    Disabled by default. Callers check "tracer.enabled" before emit(), so a
+    disabled tracer costs one attribute read and no formatting. '''
+
+    def __init__(self):
+        self.enabled = False
+        self.sink = None
+
+    def enable(self, sink=None):
+        ''' Send traces to the sink, a ConsoleSink if not given '''
+        if sink is None:
+            sink = ConsoleSink()
+        self.sink = sink
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self.sink is not None:
+            self.sink.flush()
+
+    def emit(self, event: str, msg: str, **fields):
+        ''' Record an event. msg is the human-readable form, fields the structured one. '''
+        if self.enabled is False:
+            return
+        record = {"event": event, "time": time.time(), "msg": msg}
+        record.update(fields)
+        self.sink.write(record)
+
+class ConsoleSink:
+    ''' Print the message of each record, like the old print() calls '''
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def write(self, record: dict):
+        print(record["msg"], file=self.stream)
+
+    def flush(self):
+        self.stream.flush()
+
+class MemorySink:
+    ''' Keep the records in memory, e.g. for tests and analysis '''
+
+    def __init__(self):
+        self.records = []
+
+    def write(self, record: dict):
+        self.records.append(record)
+
+    def flush(self):
+        pass
+
+class JsonlSink:
+    ''' Write records as JSON lines, in batches of buffer_size records.
+    Safe to share between threads. '''
+
+    def __init__(self, filename: str, buffer_size: int = 4096):
+        self.file = open(filename, "a", encoding="utf-8")
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.lock = threading.Lock()
+
+    def write(self, record: dict):
+        line = json.dumps(record, default=str)
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) >= self.buffer_size:
+                self.write_buffer()
+
+    def flush(self):
+        with self.lock:
+            self.write_buffer()
+
+    def write_buffer(self):
+        if len(self.buffer) > 0:
+            self.file.write("\n".join(self.buffer) + "\n")
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+tracer = Tracer()
@@ -1,4 +1,6 @@
 
+import os
+import tempfile
 import transettings
 import ruleset
 import propset
@@ -11,6 +13,20 @@ class Test_TranSettings(unittest.TestCase):
         print(f"{region1} vs {region2}")
         self.assertNotEqual(region1, region2)
 
+    def test_expiration(self):
+        self.assertEqual(transettings.parse_epoch("2024-10-04T14:10:49Z"), 1728051049)
+        self.assertEqual(transettings.parse_epoch("2024-10-04T16:10:49+02:00"), 1728051049)
+        self.assertIsNone(transettings.parse_epoch(""))
+
+        ts = transettings.TranSettings()
+        ts.ticketId = "t1"
+        ts.expirationTime = "2024-10-04T14:10:49Z"
+        self.assertTrue(ts.check_expiration(1728051049))
+        self.assertFalse(ts.check_expiration(1728051050))
+        self.assertFalse(ts.check_expiration())
+        ts.expirationTime = ""
+        self.assertFalse(ts.check_expiration(0))
+
 TRANS_TICKET_NUM = 10
 
 class Test_TransGenerator(unittest.TestCase):
@@ -31,5 +47,24 @@ class Test_TransGenerator(unittest.TestCase):
             resarr.append(res)
         self.assertEqual(len(resarr), TRANS_TICKET_NUM)
 
+        tps = [propset.TransProps(ts) for ts in arr]
+        self.assertEqual(checker.judge_many(tps), resarr)
+
+    def test_seeded(self):
+        start = transettings.datetime(2030, 1, 1)
+        regions = {"Germany": 3, "China": 1, "Japan": 0}
+        arr1 = transettings.TransGenerator(seed=7, regions=regions, start=start).generate_settings(200)
+        arr2 = transettings.TransGenerator(seed=7, regions=regions, start=start).generate_settings(200)
+        self.assertEqual([ts.to_tuple() for ts in arr1], [ts.to_tuple() for ts in arr2])
+        self.assertEqual({ts.origArea for ts in arr1}, {"Germany", "China"})
+        self.assertEqual(len({ts.ticketId for ts in arr1}), 200)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "tickets.jsonl")
+            tg = transettings.TransGenerator(seed=7, regions=regions, start=start)
+            self.assertEqual(tg.write_jsonl(filename, 200), 200)
+            arr3 = list(transettings.read_settings(filename))
+        self.assertEqual([ts.to_tuple() for ts in arr3], [ts.to_tuple() for ts in arr1])
+
 if __name__ == '__main__':
     unittest.main()
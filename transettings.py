@@ -1,10 +1,42 @@
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+import itertools
+import json
+import sys
 import uuid
 import random
 import time
 
+from tracing import tracer
+
+# Fields of TranSettings, in the order of to_tuple()
+SETTING_FIELDS = ("ticketId", "senderId", "receiverId", "receiverKey", "expectTime",
+                  "expirationTime", "origArea", "destArea", "dataType", "dataVolume",
+                  "dataUnit", "dataHash", "reason", "approver")
+
+# Fields of TranSettings => keys of the credentialSubject of a transfer VC
+VC_SUBJECT_FIELDS = (
+    ("senderId", "userName"),
+    ("receiverId", "receiver"),
+    ("receiverKey", "receiverKey"),
+    ("expectTime", "transferTime"),
+    ("origArea", "origArea"),
+    ("destArea", "destArea"),
+    ("dataType", "dataType"),
+    ("dataVolume", "dataVolume"),
+    ("dataUnit", "dataUnit"),
+    ("dataHash", "dataHash"),
+    ("reason", "reason"),
+    ("ticketId", "transferId"),
+)
+
+# Fields whose values repeat across tickets, interned to be stored once
+SHARED_FIELDS = ("origArea", "destArea", "dataType", "dataUnit", "reason")
+
 class TranSettings:
-    ''' Settings for a transborder request '''
+    ''' Settings for a transborder request. Slotted, many of them are kept in memory. '''
+    __slots__ = SETTING_FIELDS
+
     ticketId: str
     senderId: str
     receiverId: str
@@ -20,39 +52,58 @@ class TranSettings:
     reason: str
     approver: str
 
-    def check_expiration(self) -> bool:
-        expiration = parse_datatime(self.expirationTime)
-        cur_date = datetime.now()
-        if cur_date > expiration:
-            print(f'Transborder request {self.expirationTime} expired!')
+    def check_expiration(self, now: float = None) -> bool:
+        ''' False if expired at now (epoch seconds), the current time if None.
+        A ticket without an expiration time is expired. '''
+        if now is None:
+            now = time.time()
+        expiration = parse_epoch(self.expirationTime)
+        if expiration is None or expiration < now:
+            if tracer.enabled:
+                tracer.emit("expired", f'Transborder request {self.expirationTime} expired!',
+                            ticket=self.ticketId, expirationTime=self.expirationTime)
             return False
         return True
     
     def from_vc(self, vcobj):
-        self.senderId = vcobj["credentialSubject"]["userName"]
-        self.receiverId = vcobj["credentialSubject"]["receiver"]
-        self.receiverKey = vcobj["credentialSubject"]["receiverKey"]
-        self.expectTime = vcobj["credentialSubject"]["transferTime"]
+        subject = vcobj["credentialSubject"]
+        for name, key in VC_SUBJECT_FIELDS:
+            setattr(self, name, subject[key])
         self.expirationTime = vcobj["expirationDate"]
-        self.origArea = vcobj["credentialSubject"]["origArea"]
-        self.destArea = vcobj["credentialSubject"]["destArea"]
-        self.dataType = vcobj["credentialSubject"]["dataType"]
-        self.dataVolume = vcobj["credentialSubject"]["dataVolume"]
-        self.dataUnit = vcobj["credentialSubject"]["dataUnit"]
-        self.dataHash = vcobj["credentialSubject"]["dataHash"]
-        self.reason = vcobj["credentialSubject"]["reason"]
-        self.ticketId = vcobj["credentialSubject"]["transferId"]
+        self.intern_fields()
+
+    def intern_fields(self):
+        ''' Share the strings of SHARED_FIELDS with other tickets '''
+        for name in SHARED_FIELDS:
+            val = getattr(self, name, None)
+            if type(val) is str:
+                setattr(self, name, sys.intern(val))
 
     def print_info(self):
-        print(f"{self.origArea} to {self.destArea}: {self.dataType} {self.reason} ({self.dataVolume} {self.dataUnit}) {self.ticketId}")
+        print(self.info_text())
+
+    def info_text(self) -> str:
+        return f"{self.origArea} to {self.destArea}: {self.dataType} {self.reason} ({self.dataVolume} {self.dataUnit}) {self.ticketId}"
+
+    def to_tuple(self) -> tuple:
+        ''' Compact form of the settings, in the order of SETTING_FIELDS '''
+        return tuple(getattr(self, name, "") for name in SETTING_FIELDS)
+
+    @classmethod
+    def from_tuple(cls, values: tuple) -> 'TranSettings':
+        ''' Rebuild the settings from to_tuple() '''
+        settings = cls()
+        for name, val in zip(SETTING_FIELDS, values):
+            setattr(settings, name, val)
+        settings.intern_fields()
+        return settings
 
 # "did:key:z6MkkGB18uq5uE7CpJ5UVVFkWoXwr8T7MLBM9GfL18UzG6GJ"
 def create_demo_setting(sender: str, receiver: str, approver1: str) -> TranSettings:
     ''' Demo ticket '''
     print(f"DBG:Sender:{sender}, Rev: {receiver}, Approver:{approver1}")
     
-    #issuance_date = datetime.now(timezone.utc).replace(microsecond=0)
-    issuance_date = datetime.now().replace(microsecond=0)
+    issuance_date = utc_now().replace(microsecond=0)
     expiration_date = issuance_date + timedelta(weeks=2)
     expected_date = issuance_date + timedelta(weeks=1)
     
@@ -75,65 +126,119 @@ def create_demo_setting(sender: str, receiver: str, approver1: str) -> TranSetti
     settings.approver = approver1
     return settings
 
-def parse_datatime(dtstr : str) -> datetime:
-    '''
-    2024-10-04T14:10:49Z ==> datetime format
-    '''
+def parse_epoch(dtstr: str) -> int:
+    ''' "2024-10-04T14:10:49Z" ==> epoch seconds, None if empty.
+    "Z" means UTC, times without a zone are local ones. '''
     if dtstr == "":
-        # invalid
-        print(f"{dtstr} is invalid!")
-        return datetime.date(1920,1,1)
+        if tracer.enabled:
+            tracer.emit("invalid time", f"{dtstr} is invalid!", value=dtstr)
+        return None
+    return epoch_of(dtstr)
 
+@lru_cache(maxsize=4096)
+def epoch_of(dtstr: str) -> int:
+    ''' Tickets share a few distinct times, each is parsed once '''
     if dtstr.endswith("Z"):
-        dtstr = dtstr[:len(dtstr)-1] # Remove last Z
+        dtstr = dtstr[:-1] + "+00:00"
+    return int(datetime.fromisoformat(dtstr).timestamp())
 
-    #print(f'[DBG] Parsed time: {dtstr}')
-    return datetime.fromisoformat(dtstr)
+def utc_now() -> datetime:
+    ''' The current UTC time without zone, to be written with a "Z" '''
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+ALL_REGIONS = ("Germany", "Belgium", "France", "United Kingdom",
+               "United States", "China", "Singapore", "India", "Vietnam",
+               "Hong Kong", "Macro", "Japan", "Canada")
+
+ALL_REASONS = ("user consent", "Adequate level", "binding corporate rules",
+               "standard contractual clauses", "code of conduct")
+
+ALL_DATA_TYPES = ("User Privacy",)
 
 def random_region() -> str:
     ' return a random region '
-    all_regions = ["Germany", "Belgium", "France", "United Kingdom", 
-                      "United States", "China", "Singapore", "India", "Vietnam",
-                      "Hong Kong", "Macro", "Japan", "Canada"]
-    total = len(all_regions)
-    idx = random.randint(0, total-1)
-    return all_regions[idx]
+    return random.choice(ALL_REGIONS)
 
 def random_reason() -> str:
     ' return a random reason '
-    all_values = ["user consent", "Adequate level", "binding corporate rules", 
-                      "standard contractual clauses", "code of conduct"]
-    total = len(all_values)
-    idx = random.randint(0, total-1)
-    return all_values[idx]
+    return random.choice(ALL_REASONS)
 
 class TransGenerator:
-    def generate_settings(self, number: int):
-        allsettings = []
-        issuance_date = datetime.now().replace(microsecond=0)
-        expiration_date = issuance_date + timedelta(weeks=2)
-        expected_date = issuance_date + timedelta(weeks=1)
-
-        i = 0
-        while i < number:
+    ''' Synthetic tickets for tests and load tests. The same seed and start
+    (UTC) give the same tickets. regions, reasons and data_types are lists of values
+    to pick evenly, or dicts of value => weight. '''
+
+    def __init__(self, seed: int = None, regions=ALL_REGIONS, reasons=ALL_REASONS,
+                 data_types=ALL_DATA_TYPES, start: datetime = None):
+        self.rng = random.Random(seed)
+        self.regions = Distribution(regions)
+        self.reasons = Distribution(reasons)
+        self.data_types = Distribution(data_types)
+        if start is None:
+            start = utc_now()
+        self.start = start.replace(microsecond=0)
+
+    def generate_settings(self, number: int) -> list:
+        return list(self.iter_settings(number))
+
+    def iter_settings(self, number: int = None):
+        ''' Yield number tickets, endlessly if None '''
+        rng = self.rng
+        expected_time = (self.start + timedelta(weeks=1)).isoformat() + "Z"
+        expiration_time = (self.start + timedelta(weeks=2)).isoformat() + "Z"
+        counter = itertools.count() if number is None else range(number)
+        for _ in counter:
             aset = TranSettings()
-            aset.ticketId = str(uuid.uuid4())
+            aset.ticketId = str(uuid.UUID(int=rng.getrandbits(128), version=4))
             aset.senderId = "sender1" # Not important
             aset.receiverId = "Bob"
             aset.receiverKey = "receiver1" # Not important
-            aset.expectTime = expected_date.isoformat() + "Z"
-            aset.expirationTime = expiration_date.isoformat() + "Z"
-            aset.origArea = random_region()
-            aset.destArea = random_region()
-            aset.dataType = "User Privacy"
+            aset.expectTime = expected_time
+            aset.expirationTime = expiration_time
+            aset.origArea = self.regions.pick(rng)
+            aset.destArea = self.regions.pick(rng)
+            aset.dataType = self.data_types.pick(rng)
             aset.dataVolume = "10000"
             aset.dataUnit = "person"
             aset.dataHash = "5usHGst9SANMEViiINEDrZ37UZY="
-            aset.reason = random_reason()
+            aset.reason = self.reasons.pick(rng)
+            yield aset
+
+    def write_jsonl(self, filename: str, number: int) -> int:
+        ''' Write number tickets as JSON lines. Returns the number written. '''
+        return write_settings(filename, self.iter_settings(number))
+
+class Distribution:
+    ''' Values picked with their weights '''
+
+    def __init__(self, values):
+        if isinstance(values, dict):
+            self.values = tuple(values)
+            self.cum_weights = tuple(itertools.accumulate(values.values()))
+        else:
+            self.values = tuple(values)
+            self.cum_weights = None
 
-            allsettings.append(aset)
+    def pick(self, rng: random.Random) -> str:
+        if self.cum_weights is None:
+            return rng.choice(self.values)
+        return rng.choices(self.values, cum_weights=self.cum_weights)[0]
 
-            time.sleep(0.05) # for random functions
-            i=i+1
+def write_settings(filename: str, settings) -> int:
+    ''' Write TranSettings as JSON lines of their fields '''
+    total = 0
+    with open(filename, "w", encoding="utf-8") as f:
+        for ts in settings:
+            f.write(json.dumps(dict(zip(SETTING_FIELDS, ts.to_tuple()))))
+            f.write("\n")
+            total += 1
+    return total
 
-        return allsettings
+def read_settings(filename: str):
+    ''' Yield the TranSettings of a file written by write_settings() '''
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip() == "":
+                continue
+            obj = json.loads(line)
+            yield TranSettings.from_tuple(tuple(obj.get(name, "") for name in SETTING_FIELDS))
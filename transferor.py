@@ -1,10 +1,13 @@
 import json
 import asyncio
-from datetime import datetime
 from enum import Enum
+import time
 
 import didkit
 
+import chunktransfer
+from transettings import parse_epoch
+
 class CredentialType(Enum):
     ''' Verification Credential Types '''
     USER = 1
@@ -29,10 +32,14 @@ def getCredentialType(vc) -> CredentialType:
 class Transferor:
     ''' Transfer files to receiver with the settings of a credential presentation. '''
 
-    def __init__(self):
+    def __init__(self, data_file: str = None, receiver: tuple = None,
+                 streams: int = chunktransfer.DEFAULT_STREAMS):
+        ''' data_file: the payload. receiver: (host, port) of the receiver, see chunktransfer '''
         self.vp_valid = False
         self.vp_content = ""
-        pass
+        self.data_file = data_file
+        self.receiver = receiver
+        self.streams = streams
 
     def do_transfer(self, vpfile: str):
         res = self.verify_vp_file(vpfile)
@@ -78,11 +85,12 @@ class Transferor:
             return
 
         oper_cred = {}
+        now = time.time()
 
         for item in vcs:
             tp = getCredentialType(item)
             if tp == CredentialType.USER:
-                valid_user = self.is_user_expired(item)
+                valid_user = self.is_user_expired(item, now)
                 if valid_user is False:
                     print("[ERR] Invalid user!")
                     return
@@ -96,21 +104,18 @@ class Transferor:
 
         self.start_transmission(oper_cred)
 
-    def is_user_expired(self, user_cred) -> bool:
-        ''' Verify an user based on his properties '''
+    def is_user_expired(self, user_cred, now: float = None) -> bool:
+        ''' Verify an user based on his properties. now: epoch seconds, the current time if None '''
         user_name = user_cred["credentialSubject"]["userName"]
         expire_str = user_cred["expirationDate"]
         if expire_str == "":
             # No Expiration
             return True
 
-        if expire_str.endswith("Z"):
-            expire_str = expire_str[:len(expire_str)-1] # Remove last Z
-
         print(f'Expiration time: {expire_str}')
-        expire_date = datetime.fromisoformat(expire_str)
-        cur_date = datetime.now()
-        if cur_date > expire_date:
+        if now is None:
+            now = time.time()
+        if parse_epoch(expire_str) < now:
             print(f'user {user_name} expired!')
             return False
         return True
@@ -119,8 +124,19 @@ class Transferor:
         ''' Verify an Operation Credential '''
         return True
 
-    def start_transmission(self, operCred):
+    def start_transmission(self, operCred) -> chunktransfer.TransferReport:
+        ''' Send the payload in chunks, each checked by the receiver against the dataHash '''
         print("Transmission started.")
+        if self.data_file is None or self.receiver is None:
+            return None
+        subject = operCred["credentialSubject"]
+        report = chunktransfer.send_file(self.data_file, self.receiver, subject["transferId"],
+                                         subject["dataHash"], streams=self.streams)
+        if report.ok:
+            print(f"Transmission finished: {report.size} bytes in {report.seconds:.2f}s.")
+        else:
+            print(f"[ERR] Chunks {report.failed} were not accepted by the receiver!")
+        return report
 
 def print_content(jsc):
     for key in jsc:
@@ -1,7 +1,7 @@
 import asyncio
 import json
 
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 import didkit
 
@@ -9,8 +9,10 @@ from reviewer import Reviewer
 from transferor import Transferor
 from provider import Provider
 from ruleset import Decision
+from tracing import tracer
 
 import fileoper
+from transettings import utc_now
 
 class User:
     """User representing an user who has an unique DID and can init Transfer Request."""
@@ -32,7 +34,7 @@ class User:
             f.close()
 
         verification_method = await didkit.key_to_verification_method("key", self.key)
-        issuance_date = datetime.now().replace(microsecond=0)
+        issuance_date = utc_now().replace(microsecond=0)
         expiration_date = issuance_date + timedelta(weeks=2)
 
         # didkit-python-main\tests\test_main.py
@@ -110,6 +112,7 @@ def transborder_demo():
 
 def main():
     ''' Entrance '''
+    tracer.enable()
     transborder_demo()
 
 if __name__ == "__main__":
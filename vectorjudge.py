@@ -0,0 +1,179 @@
+import time
+
+import numpy as np
+
+from propset import TransProps, OrgType, SenderPropSet, ReceiverPropSet, ReceiverOrgPropSet, find_org
+from regions import normalize
+from rulebook import RuleBook, cached_scan, default_book
+from ruleset import RuleChecker, Decision
+from ticketbatch import TicketBatch, MISSING
+from transettings import TranSettings
+
+# A description of each organization type, which find_org() maps back to the type
+ORG_DESCS = {
+    OrgType.COMMERCIAL: "commercial",
+    OrgType.NGO: "no profit",
+    OrgType.GOVERNMENT: "government",
+    OrgType.CII: "cii",
+    OrgType.CONTROLLER: "controller",
+    OrgType.PROCESSOR: "processor",
+    OrgType.UNKNOWN: "",
+}
+
+NO_ORG = 0
+
+class TicketColumns:
+    ''' Integer-coded columns of many tickets, one row per ticket.
+    orig/dest: region codes; dest_name: index of the normalized destination in
+    dest_names, which RuleInBlacklist reads; reason/data: bitmasks of the legal
+    bases/kinds of data; sender/receiver/receiver_org: OrgType values, NO_ORG if
+    missing; expiry: expiration as epoch seconds. The codes and bits are those of book. '''
+
+    def __init__(self, size: int, book: RuleBook):
+        self.book = book
+        self.reason_bits = {basis: 1 << i for i, basis in enumerate(book.reason_bases)}
+        self.data_bits = {basis: 1 << i for i, basis in enumerate(book.data_bases)}
+        self.dest_names = []
+        self.orig = np.zeros(size, dtype=np.int32)
+        self.dest = np.zeros(size, dtype=np.int32)
+        self.dest_name = np.zeros(size, dtype=np.int32)
+        self.reason = np.zeros(size, dtype=np.int64)
+        self.data = np.zeros(size, dtype=np.int64)
+        self.sender = np.zeros(size, dtype=np.int32)
+        self.receiver = np.zeros(size, dtype=np.int32)
+        self.receiver_org = np.zeros(size, dtype=np.int32)
+        self.expiry = np.zeros(size, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.orig)
+
+    def decision_rows(self) -> np.ndarray:
+        ''' The columns the rules read, as one row per ticket '''
+        return np.stack([self.orig, self.dest, self.dest_name, self.reason, self.data,
+                         self.sender, self.receiver, self.receiver_org], axis=1)
+
+def encode_batch(batch: TicketBatch, book: RuleBook = None) -> TicketColumns:
+    ''' Encode the columns of a batch, against the book of rules.json if not given.
+    Each distinct string or property of a column is resolved or scanned once, and
+    the result is spread to its tickets with array operations. '''
+    if book is None:
+        book = default_book()
+    cols = TicketColumns(len(batch), book)
+    if len(batch) == 0:
+        return cols
+    strings, props = batch.strings, batch.props
+
+    cols.orig = map_column(batch, "origArea", lambda code: book.index.code(strings[code]), np.int32)
+    cols.dest = map_column(batch, "destArea", lambda code: book.index.code(strings[code]), np.int32)
+    names = {}
+    cols.dest_name = map_column(batch, "destArea",
+                                lambda code: names.setdefault(normalize(strings[code]), len(names)), np.int32)
+    cols.dest_names = list(names)
+    cols.reason = map_column(batch, "reason", lambda code: bits_of(
+        cached_scan(book.reason_matcher, strings[code]), cols.reason_bits), np.int64)
+    cols.data = map_column(batch, "dataType", lambda code: bits_of(
+        cached_scan(book.data_matcher, strings[code]), cols.data_bits), np.int64)
+
+    def user_org(code: int) -> int:
+        return NO_ORG if code == MISSING else find_org(props[code][2]).value
+    cols.sender = map_column(batch, "sender_prop", user_org, np.int32)
+    cols.receiver = map_column(batch, "receiver_prop", user_org, np.int32)
+    cols.receiver_org = map_column(batch, "receiver_org",
+                                   lambda code: NO_ORG if code == MISSING else props[code][2], np.int32)
+    cols.expiry = column(batch, "expirationTime").astype(np.int64)
+    return cols
+
+def encode_columns(reqs, book: RuleBook = None) -> TicketColumns:
+    ''' Encode requests (TransProps) into columns, through a TicketBatch '''
+    return encode_batch(TicketBatch.from_requests(reqs), book)
+
+def column(batch: TicketBatch, name: str) -> np.ndarray:
+    ''' A column of a batch as an array, without a copy '''
+    col = batch.columns[name]
+    return np.frombuffer(col, dtype=col.typecode)
+
+def map_column(batch: TicketBatch, name: str, convert, dtype) -> np.ndarray:
+    ''' convert() of each code of a column, called once per distinct code '''
+    codes, inverse = np.unique(column(batch, name), return_inverse=True)
+    values = np.array([convert(int(code)) for code in codes], dtype=dtype)
+    return values[inverse.reshape(-1)]
+
+def bits_of(bases: frozenset, bits: dict) -> int:
+    mask = 0
+    for basis in bases:
+        mask |= bits[basis]
+    return mask
+
+def row_request(cols: TicketColumns, row) -> TransProps:
+    ''' A request with the decision-relevant fields of a row, for the rules '''
+    orig, dest, dest_name, reason, data, sender, receiver, receiver_org = (int(v) for v in row)
+    index = cols.book.index
+    ts = TranSettings()
+    ts.ticketId = ""
+    ts.origArea = index.infos[orig].name
+    ts.destArea = cols.dest_names[dest_name]
+    ts.reason = ""
+    ts.dataType = ""
+    req = TransProps(ts)
+    req.region_codes = (orig, dest)
+    req.region_infos = (index.infos[orig], index.infos[dest])
+    req.reason_match = frozenset(b for b, bit in cols.reason_bits.items() if reason & bit)
+    req.data_match = frozenset(b for b, bit in cols.data_bits.items() if data & bit)
+    req.rule_version = cols.book.version
+    if sender != NO_ORG:
+        req.sender_prop = SenderPropSet.from_packed(("", "", ORG_DESCS[OrgType(sender)]))
+    if receiver != NO_ORG:
+        req.receiver_prop = ReceiverPropSet.from_packed(("", "", ORG_DESCS[OrgType(receiver)]))
+    if receiver_org != NO_ORG:
+        req.receiver_org = ReceiverOrgPropSet.from_packed(("", "", receiver_org))
+    return req
+
+def judge_columns(checker: RuleChecker, cols: TicketColumns, now: float = None) -> np.ndarray:
+    ''' Decision values (Decision.value) of all tickets.
+    Tickets are grouped by their decision rows with array operations, the rules
+    of the origin region run once per distinct row, and the results are
+    scattered back to the tickets. Expired tickets are rejected. '''
+    book = checker.book
+    if cols.book.version != book.version:
+        raise ValueError("Columns were encoded against other rules")
+    if now is None:
+        now = time.time()
+    decisions = np.full(len(cols), Decision.TBD.value, dtype=np.int8)
+    if len(cols) == 0:
+        return decisions
+
+    rows, inverse = unique_rows(cols.decision_rows())
+    row_decisions = np.empty(len(rows), dtype=np.int8)
+    for i, row in enumerate(rows):
+        rules = book.rule_sets.get(book.index.infos[int(row[0])].region)
+        if rules is None:
+            row_decisions[i] = Decision.TBD.value
+        else:
+            row_decisions[i] = rules.decide(row_request(cols, row)).decision.value
+
+    decisions = row_decisions[inverse]
+    decisions[cols.expiry < now] = Decision.REJECT.value
+    return decisions
+
+def unique_rows(matrix: np.ndarray) -> tuple:
+    ''' np.unique(matrix, axis=0, return_inverse=True), without sorting whole rows:
+    the columns are folded one by one into a dense group number of each row. '''
+    groups = np.zeros(len(matrix), dtype=np.int64)
+    for col in matrix.T:
+        values, inverse = np.unique(col, return_inverse=True)
+        _, groups = np.unique(groups * len(values) + inverse.reshape(-1), return_inverse=True)
+        groups = groups.reshape(-1)
+    _, first, inverse = np.unique(groups, return_index=True, return_inverse=True)
+    return matrix[first], inverse.reshape(-1)
+
+def count_decisions(decisions: np.ndarray) -> dict:
+    ''' Decision => number of tickets '''
+    counts = np.bincount(decisions, minlength=Decision.UNKNOWN.value + 1)
+    return {des: int(counts[des.value]) for des in Decision}
+
+def judge_vectorized(checker: RuleChecker, reqs) -> tuple:
+    ''' Encode and judge requests, a TicketBatch or TransProps. Returns the decision
+    values and their counts. '''
+    batch = reqs if isinstance(reqs, TicketBatch) else TicketBatch.from_requests(reqs)
+    decisions = judge_columns(checker, encode_batch(batch, checker.book))
+    return decisions, count_decisions(decisions)
@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+import tempfile
+import unittest
+
+import rulebook
+import ruleset
+import ticketbatch
+from ruleset_test import make_ticket
+
+try:
+    import vectorjudge
+except ImportError:
+    vectorjudge = None
+
+@unittest.skipIf(vectorjudge is None, "numpy is not installed")
+class Test_VectorJudge(unittest.TestCase):
+    def test_same_as_rule_checker(self):
+        company = {"credentialSubject": {"userName": "x", "orgnization": {"name": "n", "type": "company"}}}
+        reqs = []
+        for orig in ["Germany", "UK", "China", "Canada", "India", "Singapore", "Mars"]:
+            for dest in ["France", "USA", "China", "Japan"]:
+                for reason in ["SCCs", "contract", "data privacy framework", "none"]:
+                    for data_type in ["personal", "payment", "weather"]:
+                        req = make_ticket(orig, dest, reason, data_type)
+                        if reason == "data privacy framework":
+                            req.set_sender_prop(company)
+                            req.set_receiver_prop(company)
+                        reqs.append(req)
+        expired = make_ticket("Germany", "France", "SCCs")
+        expired.trans_props.expirationTime = "2020-01-01T00:00:00Z"
+        reqs.append(expired)
+
+        checker = ruleset.RuleChecker()
+        expected = [des.value for des in checker.judge_many(reqs)]
+        decisions, counts = vectorjudge.judge_vectorized(checker, reqs)
+        self.assertEqual(decisions.tolist(), expected)
+        self.assertEqual(sum(counts.values()), len(reqs))
+        self.assertEqual(counts[ruleset.Decision.REJECT], expected.count(ruleset.Decision.REJECT.value))
+
+        batch = ticketbatch.TicketBatch.from_requests(reqs)
+        self.assertEqual(vectorjudge.judge_vectorized(checker, batch)[0].tolist(), expected)
+
+    def test_blacklist(self):
+        defs = json.loads(rulebook.DEFAULT_RULES.read_text(encoding="utf-8"))
+        defs["jurisdictions"]["INDIA"]["deny"].append({"rule": "RuleInBlacklist", "blacklist": ["North Korea", "uk"]})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "rules.json"
+            path.write_text(json.dumps(defs), encoding="utf-8")
+            checker = ruleset.RuleChecker(book=rulebook.load_book(path, cache_dir=None))
+        reqs = [make_ticket("India", dest, "local storage")
+                for dest in ["Mars", "North Korea", "United Kingdom", "UK", " north  KOREA"]]
+        expected = [des.value for des in checker.judge_many(reqs)]
+        self.assertEqual(expected.count(ruleset.Decision.REJECT.value), 3)
+        self.assertEqual(vectorjudge.judge_vectorized(checker, reqs)[0].tolist(), expected)
+
+if __name__ == '__main__':
+    unittest.main()